@@ -0,0 +1,174 @@
+"""
+Fast access to the datasets of the data/ directory.
+
+The first load of a dataset parses its file once, and stores the result in a
+typed binary sidecar next to it (data/<name>.cache/): a .npy file for the
+numerical arrays read with np.loadtxt, one .npy file per column for the
+tables read with pd.read_csv, and one .npy file per variable for the MATLAB
+files read with scipy.io.loadmat. The following loads memory-map these
+files: nothing is parsed, and the numerical values are not even copied. The
+sidecar is rebuilt when the content of the file changes.
+
+The memory-mapped arrays are lazy: slicing them, or indexing them with
+boolean masks or integer arrays, only reads the pages of the file holding
+the selected values. The MATLAB arrays are stored in C order, so that
+selecting rows, e.g. a few spectra, reads contiguous data.
+
+From the notebooks::
+
+    import sys
+    sys.path.insert(0, '..')
+    from data_cache import load
+
+    data = load('inflammation-01')   # np.loadtxt(..., delimiter=',')
+    df = load('titanic')             # pd.read_csv(...)
+    spectra = load('spectra')['spectra']  # scipy.io.loadmat(...)
+"""
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+from scipy import io
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+# name: (file, reader, reader options)
+DATASETS = {
+    'inflammation-01': ('inflammation-01.csv', 'loadtxt', {'delimiter': ','}),
+    'kmeans_data': ('kmeans_data.csv', 'loadtxt', {}),
+    'brain_size': ('brain_size.csv', 'read_csv',
+                   {'sep': ';', 'na_values': '.', 'index_col': 0}),
+    'titanic': ('titanic.csv', 'read_csv', {}),
+    'spectra': ('spectra.mat', 'loadmat', {}),
+}
+
+
+def _source_stamp(path, with_hash=True):
+    stat = os.stat(path)
+    stamp = {'size': stat.st_size, 'mtime': stat.st_mtime}
+    if with_hash:
+        with open(path, 'rb') as f:
+            stamp['sha1'] = hashlib.sha1(f.read()).hexdigest()
+    return stamp
+
+
+def _is_fresh(path, meta_path):
+    "Whether the sidecar described by meta_path matches the source file"
+    if not os.path.exists(meta_path):
+        return False
+    with open(meta_path) as f:
+        meta = json.load(f)
+    stamp = _source_stamp(path, with_hash=False)
+    if all(meta['source'][key] == stamp[key] for key in stamp):
+        return True
+    # Touched, but maybe not modified
+    stamp = _source_stamp(path)
+    if meta['source']['sha1'] != stamp['sha1']:
+        return False
+    meta['source'] = stamp
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f, indent=1)
+    return True
+
+
+def _write_sidecar(cache_dir, path, reader, options):
+    tmp_dir = cache_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    meta = {'source': _source_stamp(path), 'reader': reader}
+    if reader == 'loadtxt':
+        np.save(os.path.join(tmp_dir, 'array.npy'),
+                np.loadtxt(path, **options))
+    elif reader == 'loadmat':
+        meta['variables'] = []
+        # One variable at a time, to only hold the largest one in memory
+        for name, _, _ in io.whosmat(path, **options):
+            values = io.loadmat(path, variable_names=[name], **options)[name]
+            if values.dtype.hasobject:
+                # Cells and structs cannot be memory-mapped
+                continue
+            np.save(os.path.join(tmp_dir, name + '.npy'),
+                    np.ascontiguousarray(values))
+            meta['variables'].append(name)
+    else:
+        df = pd.read_csv(path, **options)
+        if 'index_col' in options:
+            # Stored as columns, with placeholder names as they can be None
+            meta['index'] = list(df.index.names)
+            df.index = df.index.set_names(
+                ['__index_%d__' % i for i in range(df.index.nlevels)])
+            df = df.reset_index()
+        meta['columns'] = []
+        for i, (name, column) in enumerate(df.items()):
+            values = column.to_numpy()
+            kind = 'values'
+            if values.dtype == object:
+                # Strings as fixed width unicode, missing values as a mask
+                null = column.isnull().to_numpy()
+                values = column.where(~null, '').astype(str).to_numpy(
+                    dtype=str)
+                np.save(os.path.join(tmp_dir, '%d_null.npy' % i), null)
+                kind = 'strings'
+            np.save(os.path.join(tmp_dir, '%d.npy' % i), values)
+            meta['columns'].append({'name': name, 'kind': kind,
+                                    'dtype': str(column.dtype)})
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=1)
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.rename(tmp_dir, cache_dir)
+
+
+def _read_sidecar(cache_dir):
+    with open(os.path.join(cache_dir, 'meta.json')) as f:
+        meta = json.load(f)
+    if meta['reader'] == 'loadtxt':
+        return np.load(os.path.join(cache_dir, 'array.npy'), mmap_mode='r')
+    if meta['reader'] == 'loadmat':
+        return {name: np.load(os.path.join(cache_dir, name + '.npy'),
+                              mmap_mode='r')
+                for name in meta['variables']}
+    columns = {}
+    for i, column in enumerate(meta['columns']):
+        # A view of the memory map, as a plain ndarray
+        values = np.asarray(np.load(os.path.join(cache_dir, '%d.npy' % i),
+                                    mmap_mode='r'))
+        if column['kind'] == 'strings':
+            null = np.load(os.path.join(cache_dir, '%d_null.npy' % i))
+            values = values.astype(object)
+            values[null] = np.nan
+            values = pd.Series(values).astype(column['dtype']).array
+        columns[column['name']] = values
+    df = pd.DataFrame(columns, copy=False)
+    if 'index' in meta:
+        df = df.set_index(list(df.columns[:len(meta['index'])]))
+        df.index = df.index.set_names(meta['index'])
+    return df
+
+
+def load(name):
+    """Load a dataset of the data/ directory, through its binary sidecar.
+
+    Parameters
+    ----------
+    name : str
+        The name of the dataset, one of DATASETS.
+
+    Returns
+    -------
+    data : ndarray, DataFrame or dict
+        The dataset, as np.loadtxt, pd.read_csv or scipy.io.loadmat (without
+        the header entries) would return it. Arrays are read-only memory
+        maps.
+    """
+    if name not in DATASETS:
+        raise ValueError('Unknown dataset %r, choose one of %s'
+                         % (name, ', '.join(sorted(DATASETS))))
+    filename, reader, options = DATASETS[name]
+    path = os.path.join(DATA_DIR, filename)
+    cache_dir = os.path.join(DATA_DIR, name + '.cache')
+    if not _is_fresh(path, os.path.join(cache_dir, 'meta.json')):
+        _write_sidecar(cache_dir, path, reader, options)
+    return _read_sidecar(cache_dir)
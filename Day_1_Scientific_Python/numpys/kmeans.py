@@ -0,0 +1,296 @@
+"""
+K-means clustering, as in k_means.ipynb, scaling to large datasets.
+
+The notebook computes all the point-centroid differences at once::
+
+    deltas = data[:, np.newaxis, :] - centroids
+    distances = np.sqrt(np.sum((deltas) ** 2, 2))
+
+which builds an array of shape (n_points, K, n_dims). Here the squared
+distances are expanded as ||x||^2 - 2 x.c + ||c||^2, so that they boil down
+to a matrix product, computed on blocks of points to bound the memory used.
+The centroids are updated with np.bincount rather than with a loop over the
+clusters, and the iterations stop when the centroids do not move any more.
+
+    import kmeans
+    centroids, closest, inertia = kmeans.kmeans(data, K=3)
+
+For points that do not fit in memory, minibatch_kmeans updates the
+centroids from batches of points read one at a time from a file, in
+constant memory::
+
+    for centroids, inertia in kmeans.minibatch_kmeans(
+            kmeans.iter_batches('../data/kmeans_data.csv'), K=3):
+        print(inertia)
+"""
+from concurrent.futures import ThreadPoolExecutor
+import itertools
+
+import numpy as np
+
+BLOCK_SIZE = 65536
+BATCH_SIZE = 1024
+
+
+def assign(data, centroids, data_squared_norms=None, block_size=BLOCK_SIZE):
+    """Assign each point to its closest centroid.
+
+    Parameters
+    ----------
+    data : ndarray of shape (n_points, n_dims)
+        The points.
+    centroids : ndarray of shape (K, n_dims)
+        The centroids.
+    data_squared_norms : ndarray of shape (n_points,), optional
+        The squared norms of the points, if already computed.
+    block_size : int
+        The number of points whose distances are computed at once.
+
+    Returns
+    -------
+    closest : ndarray of shape (n_points,)
+        The index of the closest centroid of each point.
+    inertia : float
+        The sum of the squared distances of the points to their centroid.
+    """
+    if data_squared_norms is None:
+        data_squared_norms = np.einsum('ij,ij->i', data, data)
+    centroids_squared_norms = np.einsum('ij,ij->i', centroids, centroids)
+    closest = np.empty(len(data), dtype=np.intp)
+    inertia = 0.
+    for start in range(0, len(data), block_size):
+        block = slice(start, start + block_size)
+        # ||x - c||^2 up to the ||x||^2 term, which does not change argmin
+        distances = data[block] @ centroids.T
+        distances *= -2
+        distances += centroids_squared_norms
+        closest[block] = distances.argmin(axis=1)
+        min_distances = distances[np.arange(len(distances)), closest[block]]
+        min_distances += data_squared_norms[block]
+        inertia += np.maximum(min_distances, 0).sum()
+    return closest, inertia
+
+
+def update_centroids(data, closest, centroids):
+    """Move each centroid to the mean of its points.
+
+    The centroids without any point are left where they are.
+    """
+    K = len(centroids)
+    counts = np.bincount(closest, minlength=K)
+    sums = np.stack([np.bincount(closest, weights=column, minlength=K)
+                     for column in data.T], axis=1)
+    new_centroids = centroids.copy()
+    non_empty = counts > 0
+    new_centroids[non_empty] = sums[non_empty] / counts[non_empty, np.newaxis]
+    return new_centroids
+
+
+def kmeans_plusplus(data, K, random_state=None):
+    """Choose K initial centroids among the points, with k-means++.
+
+    Each new centroid is drawn with a probability proportional to the
+    squared distance of the points to the closest centroid already chosen.
+    """
+    rng = np.random.RandomState(random_state)
+    centroids = np.empty((K, data.shape[1]))
+    centroids[0] = data[rng.randint(len(data))]
+    min_distances = ((data - centroids[0]) ** 2).sum(axis=1)
+    for k in range(1, K):
+        total = min_distances.sum()
+        if total > 0:
+            index = np.searchsorted(np.cumsum(min_distances),
+                                    rng.uniform(0, total))
+            index = min(index, len(data) - 1)
+        else:
+            index = rng.randint(len(data))
+        centroids[k] = data[index]
+        np.minimum(min_distances, ((data - centroids[k]) ** 2).sum(axis=1),
+                   out=min_distances)
+    return centroids
+
+
+def _kmeans_single(data, K, init, max_iter, tol, random_state, block_size,
+                   data_squared_norms):
+    if isinstance(init, str) and init == 'k-means++':
+        centroids = kmeans_plusplus(data, K, random_state)
+    elif isinstance(init, str) and init == 'random':
+        # As in the notebook: random centroids around the data
+        rng = np.random.RandomState(random_state)
+        centroids = (rng.randn(K, data.shape[1]) * np.std(data, 0)
+                     + np.mean(data, 0))
+    else:
+        centroids = np.array(init, dtype=float)
+
+    for iteration in range(max_iter):
+        closest, inertia = assign(data, centroids, data_squared_norms,
+                                  block_size)
+        new_centroids = update_centroids(data, closest, centroids)
+        shift = ((new_centroids - centroids) ** 2).sum()
+        centroids = new_centroids
+        if shift <= tol:
+            break
+    closest, inertia = assign(data, centroids, data_squared_norms, block_size)
+    return centroids, closest, inertia
+
+
+def kmeans(data, K, n_init=10, init='k-means++', max_iter=300, tol=1e-4,
+           random_state=None, n_jobs=None, block_size=BLOCK_SIZE):
+    """Cluster the points in K groups, keeping the best of several runs.
+
+    Parameters
+    ----------
+    data : ndarray of shape (n_points, n_dims)
+        The points.
+    K : int
+        The number of clusters.
+    n_init : int
+        The number of runs, from different initial centroids.
+    init : 'k-means++', 'random' or ndarray of shape (K, n_dims)
+        How to choose the initial centroids: with k-means++, at random
+        around the data like in the notebook, or given (then a single run is
+        done).
+    max_iter : int
+        The maximum number of iterations of a run.
+    tol : float
+        A run stops when the centroids move less than this, relatively to
+        the variance of the data.
+    random_state : int or None
+        Seeds the initializations.
+    n_jobs : int or None
+        The number of threads running the runs, one per CPU by default.
+    block_size : int
+        The number of points whose distances are computed at once.
+
+    Returns
+    -------
+    centroids : ndarray of shape (K, n_dims)
+        The centroids of the best run.
+    closest : ndarray of shape (n_points,)
+        The cluster of each point.
+    inertia : float
+        The sum of the squared distances of the points to their centroid.
+    """
+    data = np.asarray(data, dtype=float)
+    if not isinstance(init, str):
+        n_init = 1
+    rng = np.random.RandomState(random_state)
+    seeds = rng.randint(np.iinfo(np.int32).max, size=n_init)
+    tol = tol * np.var(data, axis=0).sum()
+    data_squared_norms = np.einsum('ij,ij->i', data, data)
+
+    def run(seed):
+        return _kmeans_single(data, K, init, max_iter, tol, seed, block_size,
+                              data_squared_norms)
+
+    # The matrix products release the GIL: threads share the data
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        results = list(executor.map(run, seeds))
+    return min(results, key=lambda result: result[2])
+
+
+def iter_batches(path, batch_size=BATCH_SIZE, delimiter=None):
+    """Iterate over the points of a file, by batches of batch_size points.
+
+    Parameters
+    ----------
+    path : str
+        A .npy file, which is memory-mapped, or a text file with one point
+        per line, as read by np.loadtxt.
+    batch_size : int
+        The number of points per batch.
+    delimiter : str or None
+        The delimiter of the text file, whitespace by default.
+
+    Yields
+    ------
+    batch : ndarray of shape (batch_size, n_dims)
+        The points of the batch (the last batch may be smaller).
+    """
+    if path.endswith('.npy'):
+        points = np.load(path, mmap_mode='r')
+        for start in range(0, len(points), batch_size):
+            yield np.array(points[start:start + batch_size], dtype=float)
+        return
+    with open(path) as f:
+        while True:
+            lines = list(itertools.islice(f, batch_size))
+            if not lines:
+                return
+            yield np.loadtxt(lines, delimiter=delimiter, ndmin=2)
+
+
+def minibatch_kmeans(batches, K, init='k-means++', max_no_improvement=10,
+                     smoothing=.1, random_state=None):
+    """Cluster a stream of points in K groups, one batch of points at a time.
+
+    Each batch moves the centroids towards the mean of the points assigned
+    to them, with a learning rate decreasing as the number of points seen by
+    each centroid grows: a centroid stays the mean of all the points it was
+    assigned so far.
+
+    Parameters
+    ----------
+    batches : iterable of ndarray of shape (batch_size, n_dims)
+        The batches of points, for instance from iter_batches.
+    K : int
+        The number of clusters.
+    init : 'k-means++' or ndarray of shape (K, n_dims)
+        The initial centroids, or k-means++ on the first batch.
+    max_no_improvement : int or None
+        Stop when the smoothed inertia did not improve for this number of
+        consecutive batches. None to use all the batches.
+    smoothing : float
+        The weight of the last batch in the exponentially smoothed inertia.
+    random_state : int or None
+        Seeds the k-means++ initialization.
+
+    Yields
+    ------
+    centroids : ndarray of shape (K, n_dims)
+        The centroids after each batch.
+    inertia : float
+        The mean squared distance of the points of the batch to their
+        centroid, before the update.
+    """
+    centroids = None
+    counts = np.zeros(K)
+    best_inertia, n_no_improvement = np.inf, 0
+    smoothed_inertia = None
+    for batch in batches:
+        batch = np.asarray(batch, dtype=float)
+        if len(batch) == 0:
+            continue
+        if centroids is None:
+            if isinstance(init, str):
+                centroids = kmeans_plusplus(batch, K, random_state)
+            else:
+                centroids = np.array(init, dtype=float)
+        closest, inertia = assign(batch, centroids)
+        inertia /= len(batch)
+
+        batch_counts = np.bincount(closest, minlength=K)
+        batch_sums = np.stack([np.bincount(closest, weights=column,
+                                           minlength=K)
+                               for column in batch.T], axis=1)
+        counts += batch_counts
+        seen = batch_counts > 0
+        # Running mean: move by the batch's share of the points seen
+        learning_rate = batch_counts[seen] / counts[seen]
+        batch_means = batch_sums[seen] / batch_counts[seen, np.newaxis]
+        centroids[seen] += (learning_rate[:, np.newaxis]
+                            * (batch_means - centroids[seen]))
+        yield centroids.copy(), inertia
+
+        if max_no_improvement is None:
+            continue
+        if smoothed_inertia is None:
+            smoothed_inertia = inertia
+        else:
+            smoothed_inertia += smoothing * (inertia - smoothed_inertia)
+        if smoothed_inertia < best_inertia:
+            best_inertia, n_no_improvement = smoothed_inertia, 0
+        else:
+            n_no_improvement += 1
+            if n_no_improvement >= max_no_improvement:
+                return
@@ -0,0 +1,314 @@
+"""
+Out-of-core access to flow time series such as ../data/vmm_flowdata.csv.
+
+The CSV file is parsed only once, chunk by chunk, into a columnar cache
+next to it: one raw binary file per column, the time index being stored as
+int64 nanoseconds. Later loads memory-map these files and only read the rows
+of the requested date range and the requested columns, so that::
+
+    data = pd.read_csv("../data/vmm_flowdata.csv", index_col=0,
+                       parse_dates=True)
+    data['2011':'2012']['L06_347'].resample('M').mean()
+
+becomes::
+
+    import flowdata
+    flowdata.load('2011', '2012', columns=['L06_347']).resample('M').mean()
+
+The peak memory is bounded by the chunk size when building the cache, and by
+the size of the requested slice afterwards. The cache is rebuilt when the
+CSV file changes.
+
+For series too long to be loaded at once, resample_agg computes several
+statistics per period (mean, min, max, count and an approximate median) in
+a single pass over chunks of the cache::
+
+    flowdata.resample_agg('M', 'L06_347', '2011', '2012')
+"""
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+FLOWDATA = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        os.pardir, 'data', 'vmm_flowdata.csv')
+CHUNKSIZE = 100000
+
+
+def _cache_dir(path):
+    return os.path.splitext(path)[0] + '.cache'
+
+
+def _source_stamp(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def build_cache(path=FLOWDATA, dtype='float64', chunksize=CHUNKSIZE):
+    """Parse a CSV time series chunk by chunk into its columnar cache.
+
+    Parameters
+    ----------
+    path : str
+        The CSV file, with the times in its first column.
+    dtype : str or dict
+        The dtype of the data columns, or a dict giving it per column.
+    chunksize : int
+        The number of rows parsed at once.
+
+    Returns
+    -------
+    cache_dir : str
+        The directory of the cache.
+    """
+    cache_dir = _cache_dir(path)
+    index_name, *columns = pd.read_csv(path, nrows=0).columns
+    if not isinstance(dtype, dict):
+        dtype = {column: dtype for column in columns}
+
+    tmp_dir = cache_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    files = {name: open(os.path.join(tmp_dir, '%d.bin' % i), 'wb')
+             for i, name in enumerate([index_name] + columns)}
+    n_rows = 0
+    is_sorted = True
+    last_time = np.iinfo(np.int64).min
+    try:
+        for chunk in pd.read_csv(path, index_col=0, parse_dates=[0],
+                                 dtype=dtype, chunksize=chunksize):
+            times = chunk.index.values.astype('datetime64[ns]').view('int64')
+            if len(times):
+                is_sorted &= bool(last_time <= times[0]
+                                  and np.all(np.diff(times) >= 0))
+                last_time = times[-1]
+            files[index_name].write(times.tobytes())
+            for column in columns:
+                values = chunk[column].to_numpy(dtype=dtype[column])
+                files[column].write(values.tobytes())
+            n_rows += len(chunk)
+    finally:
+        for f in files.values():
+            f.close()
+
+    meta = {'source': _source_stamp(path), 'n_rows': n_rows,
+            'index': index_name, 'columns': columns,
+            'dtypes': {column: np.dtype(dtype[column]).str
+                       for column in columns},
+            'sorted': is_sorted}
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=1)
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.rename(tmp_dir, cache_dir)
+    return cache_dir
+
+
+class ColumnStore:
+    """Memory-mapped columns of the cache of a CSV time series.
+
+    Parameters
+    ----------
+    path : str
+        The CSV file. Its cache is built if missing or out of date.
+    """
+
+    def __init__(self, path=FLOWDATA):
+        self.path = path
+        self.cache_dir = _cache_dir(path)
+        meta_path = os.path.join(self.cache_dir, 'meta.json')
+        meta = None
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+        if meta is None or meta['source'] != _source_stamp(path):
+            build_cache(path)
+            with open(meta_path) as f:
+                meta = json.load(f)
+        self.meta = meta
+        self.columns = meta['columns']
+        self.index = self._memmap(0, 'int64')
+
+    def __len__(self):
+        return self.meta['n_rows']
+
+    def _memmap(self, i, dtype):
+        if len(self) == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(os.path.join(self.cache_dir, '%d.bin' % i),
+                         dtype=dtype, mode='r', shape=(len(self),))
+
+    def column(self, name):
+        "The memory-mapped values of a column"
+        return self._memmap(self.columns.index(name) + 1,
+                            self.meta['dtypes'][name])
+
+    def rows(self, start=None, stop=None):
+        """The rows between two times, both included, as a slice or a mask.
+
+        Like for pandas partial string indexing, a string stop such as
+        '2012' includes the whole period that it denotes.
+        """
+        start = _to_ns(start, 'start_time')
+        stop = _to_ns(stop, 'end_time')
+        if self.meta['sorted']:
+            first = 0 if start is None else np.searchsorted(
+                self.index, start, side='left')
+            last = len(self) if stop is None else np.searchsorted(
+                self.index, stop, side='right')
+            return slice(first, last)
+        mask = np.ones(len(self), dtype=bool)
+        if start is not None:
+            mask &= self.index >= start
+        if stop is not None:
+            mask &= self.index <= stop
+        return mask
+
+    def frame(self, rows=slice(None), columns=None):
+        "The given rows and columns as a DataFrame"
+        if columns is None:
+            columns = self.columns
+        index = pd.DatetimeIndex(
+            np.asarray(self.index[rows]).view('datetime64[ns]'),
+            name=self.meta['index'])
+        return pd.DataFrame(
+            {name: np.asarray(self.column(name)[rows]) for name in columns},
+            index=index, columns=columns)
+
+    def iter_chunks(self, rows=slice(None), columns=None, chunksize=CHUNKSIZE):
+        "Iterate over the given rows and columns, by chunks of chunksize rows"
+        if isinstance(rows, slice):
+            rows = range(*rows.indices(len(self)))
+        else:
+            rows = np.flatnonzero(rows)
+        for i in range(0, len(rows), chunksize):
+            chunk = rows[i:i + chunksize]
+            if isinstance(chunk, range):
+                chunk = slice(chunk.start, chunk.stop)
+            yield self.frame(chunk, columns)
+
+
+def _to_ns(time, period_bound):
+    "A time as int64 nanoseconds, strings denoting their whole period"
+    if time is None:
+        return None
+    if isinstance(time, str):
+        time = getattr(pd.Period(time), period_bound)
+    return pd.Timestamp(time).to_datetime64().astype('datetime64[ns]').view(
+        'int64')
+
+
+def load(start=None, stop=None, columns=None, path=FLOWDATA):
+    """Load a date range of a CSV time series, through its columnar cache.
+
+    Parameters
+    ----------
+    start, stop : str, datetime or None
+        The first and last times to load, both included. Strings such as
+        '2012' or '2012-03' denote their whole period, as for pandas
+        partial string indexing.
+    columns : list of str or None
+        The columns to load, all of them by default.
+    path : str
+        The CSV file, vmm_flowdata.csv by default.
+
+    Returns
+    -------
+    data : DataFrame
+        The data, indexed by time.
+    """
+    store = ColumnStore(path)
+    return store.frame(store.rows(start, stop), columns)
+
+
+def _sketch_keys(values, gamma, min_value):
+    """Keys of the logarithmic buckets of a quantile sketch.
+
+    The buckets of positive values are ]gamma**(k-1), gamma**k], those of
+    negative values their opposite, and values smaller than min_value in
+    absolute value fall in bucket 0. The keys are ordered like the values.
+    """
+    offset = np.ceil(np.log(min_value) / np.log(gamma)) - 1
+    magnitude = np.abs(values)
+    keys = np.zeros(len(values), dtype=np.int64)
+    large = magnitude >= min_value
+    keys[large] = (np.ceil(np.log(magnitude[large]) / np.log(gamma))
+                   - offset) * np.sign(values[large])
+    return keys
+
+
+def _sketch_values(keys, gamma, min_value):
+    "Values represented by the buckets of a quantile sketch"
+    offset = np.ceil(np.log(min_value) / np.log(gamma)) - 1
+    exponent = np.abs(keys) + offset
+    return np.sign(keys) * 2 * gamma ** exponent / (gamma + 1)
+
+
+def _sketch_median(sketch, gamma, min_value):
+    "Median per period of a sketch: counts indexed by (period, key)"
+    medians = {}
+    for period, counts in sketch.groupby(level=0):
+        counts = counts.droplevel(0).sort_index()
+        cumulative = np.cumsum(counts.to_numpy())
+        n = cumulative[-1]
+        # Average the two middle values for even counts, like pandas
+        middle = np.searchsorted(
+            cumulative, [(n - 1) // 2 + 1, n // 2 + 1], side='left')
+        medians[period] = _sketch_values(
+            counts.index.to_numpy()[middle], gamma, min_value).mean()
+    return pd.Series(medians, dtype=float)
+
+
+def resample_agg(rule, column, start=None, stop=None, path=FLOWDATA,
+                 chunksize=CHUNKSIZE, relative_accuracy=.01, min_value=1e-9):
+    """Statistics of a column per period, in a single pass over chunks.
+
+    Each chunk of the column is resampled on its own, and the partial
+    statistics of periods spanning several chunks are merged. The median
+    is approximated with a mergeable quantile sketch (logarithmic buckets,
+    as in DDSketch), with a relative error bounded by relative_accuracy.
+
+    Parameters
+    ----------
+    rule : str
+        The resampling frequency, as for DataFrame.resample.
+    column : str
+        The column to aggregate.
+    start, stop : str, datetime or None
+        The date range to aggregate, as for load.
+    path : str
+        The CSV file, vmm_flowdata.csv by default.
+    chunksize : int
+        The number of rows read at once.
+    relative_accuracy : float
+        The relative error of the median.
+    min_value : float
+        The values smaller than this in absolute value count as zeros in
+        the median.
+
+    Returns
+    -------
+    stats : DataFrame
+        The mean, min, max, count and median of the column per period.
+    """
+    store = ColumnStore(path)
+    gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+    partial_stats, partial_sketches = [], []
+    for chunk in store.iter_chunks(store.rows(start, stop), [column],
+                                   chunksize):
+        values = chunk[column].dropna()
+        partial_stats.append(
+            chunk[column].resample(rule).agg(['sum', 'count', 'min', 'max']))
+        keys = _sketch_keys(values.to_numpy(), gamma, min_value)
+        partial_sketches.append(
+            values.groupby([pd.Grouper(freq=rule), keys]).size())
+
+    if not partial_stats:
+        return pd.DataFrame(columns=['mean', 'min', 'max', 'count', 'median'])
+    stats = pd.concat(partial_stats).groupby(level=0).agg(
+        {'sum': 'sum', 'count': 'sum', 'min': 'min', 'max': 'max'})
+    stats['mean'] = stats['sum'] / stats['count'].where(stats['count'] > 0)
+    sketch = pd.concat(partial_sketches).groupby(level=[0, 1]).sum()
+    stats['median'] = _sketch_median(sketch, gamma, min_value)
+    return stats[['mean', 'min', 'max', 'count', 'median']]
@@ -0,0 +1,419 @@
+"""
+Dictionary-encoded cast and titles tables of the movie exercises.
+
+The exercises on ../data/cast.csv and ../data/titles.csv filter the tables
+and group them by title, name, character or type, so that pandas hashes
+the same Python strings again and again. Here the CSV files are parsed only
+once, chunk by chunk, into a columnar cache next to them: the string columns
+are stored as int32 codes, one raw binary file per column, with their
+distinct values in a code table sorted lexicographically. Loads
+memory-map the codes and return categorical columns::
+
+    import movies
+
+    cast = movies.load('cast')      # pd.read_csv('../data/cast.csv')
+    titles = movies.load('titles')  # pd.read_csv('../data/titles.csv')
+
+The group-bys on the codes are reductions with np.bincount, or with
+np.maximum.at and np.minimum.at. The results are those of pandas,
+with the groups sorted in the same order::
+
+    leading = cast[cast['n'] == 1]
+    # leading.groupby([cast['year'] // 10 * 10, 'type']).size()
+    movies.group_size(leading, [cast['year'] // 10 * 10, 'type'])
+    # cast.groupby('title')['n'].transform('max')
+    movies.group_transform(cast, 'title', 'n', 'max')
+    # cast[cast['year'] == 2010]['name'].value_counts()
+    movies.value_counts(cast[cast['year'] == 2010]['name'])
+
+The cache is rebuilt when the CSV file changes.
+"""
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        os.pardir, 'data')
+TABLES = {'cast': 'cast.csv', 'titles': 'titles.csv'}
+CHUNKSIZE = 1000000
+CODES_DTYPE = 'int32'
+# Separator of the values of a code table, absent from the CSV values
+SEPARATOR = '\0'
+AGGREGATIONS = ('size', 'count', 'sum', 'mean', 'min', 'max')
+
+
+def _cache_dir(path):
+    return os.path.splitext(path)[0] + '.cache'
+
+
+def _source_stamp(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def _append(f, values):
+    f.write(np.ascontiguousarray(values).tobytes())
+
+
+def _promote(path, dtype, new_dtype):
+    "Convert the values of a column file, e.g. from int64 to float64"
+    values = np.fromfile(path, dtype=dtype).astype(new_dtype)
+    values.tofile(path)
+
+
+def build_cache(path, chunksize=CHUNKSIZE):
+    """Parse a CSV table chunk by chunk into its dictionary-encoded cache.
+
+    Parameters
+    ----------
+    path : str
+        The CSV file.
+    chunksize : int
+        The number of rows parsed at once.
+
+    Returns
+    -------
+    cache_dir : str
+        The directory of the cache.
+    """
+    cache_dir = _cache_dir(path)
+    columns = list(pd.read_csv(path, nrows=0).columns)
+    tmp_dir = cache_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    paths = [os.path.join(tmp_dir, '%d.bin' % i) for i in range(len(columns))]
+    # The kind of each column is given by its first chunk
+    dtypes = {}
+    tables = {}
+    n_rows = 0
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        for i, name in enumerate(columns):
+            column = chunk[name]
+            if name not in dtypes:
+                numerical = column.dtype.kind in 'biuf'
+                dtypes[name] = (column.dtype.str if numerical
+                                else np.dtype(CODES_DTYPE).str)
+                if not numerical:
+                    tables[name] = {}
+            if name in tables:
+                table = tables[name]
+                codes, uniques = pd.factorize(column)
+                # Codes of the chunk -> codes of all the chunks so far
+                mapping = np.array([table.setdefault(value, len(table))
+                                    for value in uniques] + [-1],
+                                   dtype=CODES_DTYPE)
+                values = mapping[codes]
+            elif column.dtype.kind not in 'biuf':
+                raise ValueError('Column %r is numerical in the first rows '
+                                 'of %s, but not after row %d'
+                                 % (name, path, n_rows))
+            else:
+                values = column.to_numpy()
+                dtype = np.result_type(np.dtype(dtypes[name]), values.dtype)
+                if dtype != np.dtype(dtypes[name]):
+                    # Missing values in a column of integers so far
+                    _promote(paths[i], dtypes[name], dtype)
+                    dtypes[name] = dtype.str
+                values = values.astype(dtypes[name])
+            with open(paths[i], 'ab') as f:
+                _append(f, values)
+        n_rows += len(chunk)
+
+    for name, table in tables.items():
+        # Sorted code tables: the codes are ordered like the values
+        values = np.array([str(value) for value in table], dtype=object)
+        order = np.argsort(values, kind='stable')
+        new_codes = np.empty(len(order) + 1, dtype=CODES_DTYPE)
+        new_codes[order] = np.arange(len(order))
+        new_codes[-1] = -1
+        codes = np.memmap(paths[columns.index(name)], dtype=CODES_DTYPE,
+                          mode='r+', shape=(n_rows,))
+        for start in range(0, n_rows, chunksize):
+            codes[start:start + chunksize] = new_codes[
+                codes[start:start + chunksize]]
+        codes.flush()
+        del codes
+        with open(os.path.join(tmp_dir, '%d.values' % columns.index(name)),
+                  'w', encoding='utf-8') as f:
+            f.write(SEPARATOR.join(values[order]))
+
+    meta = {'source': _source_stamp(path), 'n_rows': n_rows,
+            'columns': columns, 'dtypes': dtypes,
+            'encoded': sorted(tables)}
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=1)
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.rename(tmp_dir, cache_dir)
+    return cache_dir
+
+
+def table_path(name, data_dir=DATA_DIR):
+    "The CSV file of a table, 'cast' or 'titles', or the path of a CSV file"
+    return os.path.join(data_dir, TABLES[name]) if name in TABLES else name
+
+
+def cache_dir(name, data_dir=DATA_DIR):
+    "The directory of the cache of a table, as for table_path"
+    return _cache_dir(table_path(name, data_dir))
+
+
+def load(name, columns=None, data_dir=DATA_DIR):
+    """Load a table of the movie exercises, through its encoded cache.
+
+    Parameters
+    ----------
+    name : str
+        The table, 'cast' or 'titles', or the path of another CSV file.
+    columns : list of str or None
+        The columns to load, all of them by default.
+    data_dir : str
+        The directory of the CSV files of the tables.
+
+    Returns
+    -------
+    table : DataFrame
+        The table, as pd.read_csv would return it, but with categorical
+        columns for the strings.
+    """
+    path = table_path(name, data_dir)
+    table_dir = _cache_dir(path)
+    meta_path = os.path.join(table_dir, 'meta.json')
+    meta = None
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+    if meta is None or meta['source'] != _source_stamp(path):
+        build_cache(path)
+        with open(meta_path) as f:
+            meta = json.load(f)
+    if columns is None:
+        columns = meta['columns']
+    table = {}
+    for column in columns:
+        i = meta['columns'].index(column)
+        dtype = meta['dtypes'][column]
+        if meta['n_rows'] == 0:
+            values = np.empty(0, dtype=dtype)
+        else:
+            values = np.memmap(os.path.join(table_dir, '%d.bin' % i),
+                               dtype=dtype, mode='r',
+                               shape=(meta['n_rows'],))
+        if column in meta['encoded']:
+            with open(os.path.join(table_dir, '%d.values' % i),
+                      encoding='utf-8') as f:
+                text = f.read()
+            categories = text.split(SEPARATOR) if text else []
+            values = pd.Categorical.from_codes(
+                np.asarray(values), pd.Index(categories, dtype=object),
+                validate=False)
+        else:
+            values = np.asarray(values)
+        table[column] = values
+    return pd.DataFrame(table, columns=columns, copy=False)
+
+
+def _encode(values):
+    """Codes of values and their levels, -1 for missing values: the levels
+    are the categories of a categorical, in their order as in groupby, and
+    otherwise the sorted values."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        levels = pd.CategoricalIndex(pd.Categorical.from_codes(
+            np.arange(len(values.cat.categories)), dtype=values.dtype))
+        return values.cat.codes.to_numpy(np.int64), levels
+    values = values.to_numpy()
+    if values.dtype.kind in 'iu' and len(values):
+        # Integers such as years: offsets from the smallest one
+        low, high = values.min(), values.max()
+        if high - low <= max(len(values), 2 ** 16):
+            codes = values.astype(np.int64) - low
+            present = np.bincount(codes).nonzero()[0]
+            lookup = np.full(high - low + 1, -1)
+            lookup[present] = np.arange(len(present))
+            return lookup[codes], pd.Index(present + low, dtype=values.dtype)
+    missing = pd.isnull(values)
+    levels, codes = np.unique(values[~missing], return_inverse=True)
+    all_codes = np.full(len(values), -1)
+    all_codes[~missing] = codes
+    return all_codes, pd.Index(levels)
+
+
+def _group_codes(frame, by):
+    """Flat group of each row of frame, -1 for missing keys, and the index
+    of the groups."""
+    if not isinstance(by, list):
+        by = [by]
+    keys, names = [], []
+    for key in by:
+        if isinstance(key, str):
+            key = frame[key]
+        elif not key.index.equals(frame.index):
+            # A Series of the unfiltered table, as in groupby
+            key = key.reindex(frame.index)
+        keys.append(_encode(key))
+        names.append(key.name)
+    codes = np.zeros(len(frame), dtype=np.int64)
+    missing = np.zeros(len(frame), dtype=bool)
+    n_groups = 1
+    for key_codes, levels in keys:
+        missing |= key_codes < 0
+        codes = codes * len(levels) + key_codes
+        n_groups *= len(levels)
+    codes[missing] = -1
+    # Only the groups found in frame, in the order of their levels
+    if n_groups <= max(len(frame), 2 ** 20):
+        present = np.flatnonzero(np.bincount(codes[~missing],
+                                             minlength=n_groups))
+        lookup = np.full(n_groups, -1)
+        lookup[present] = np.arange(len(present))
+        codes[~missing] = lookup[codes[~missing]]
+    else:
+        present, codes[~missing] = np.unique(codes[~missing],
+                                             return_inverse=True)
+    levels = np.unravel_index(present, [len(levels) for _, levels in keys])
+    index = pd.MultiIndex.from_arrays(
+        [keys[i][1][level] for i, level in enumerate(levels)], names=names)
+    if len(keys) == 1:
+        index = index.get_level_values(0)
+    return codes, index
+
+
+def group_size(frame, by):
+    """The number of rows of each group, as frame.groupby(by).size().
+
+    Parameters
+    ----------
+    frame : DataFrame
+        The table, for instance loaded by load.
+    by : str, Series or list of str or Series
+        The columns, or Series aligned with the rows of frame, whose values
+        define the groups.
+
+    Returns
+    -------
+    size : Series
+        The number of rows per group, for the groups of frame.
+    """
+    codes, index = _group_codes(frame, by)
+    size = np.bincount(codes[codes >= 0], minlength=len(index))
+    return pd.Series(size, index=index, dtype=np.int64)
+
+
+def _reduce(codes, values, n_groups, func):
+    "Reduction of the values of each group, NaN for the empty groups"
+    valid = codes >= 0
+    if func == 'size':
+        return np.bincount(codes[valid], minlength=n_groups)
+    valid &= ~pd.isnull(values)
+    codes, values = codes[valid], values[valid]
+    count = np.bincount(codes, minlength=n_groups)
+    if func == 'count':
+        return count
+    if func in ('sum', 'mean'):
+        total = np.bincount(codes, weights=values, minlength=n_groups)
+        if func == 'sum':
+            return total
+        return total / np.where(count > 0, count, np.nan)
+    if func == 'max':
+        result = np.full(n_groups, -np.inf)
+        np.maximum.at(result, codes, values)
+    else:
+        result = np.full(n_groups, np.inf)
+        np.minimum.at(result, codes, values)
+    return np.where(count > 0, result, np.nan)
+
+
+def group_agg(frame, by, column, func):
+    """A reduction of a column per group, as frame.groupby(by)[column].agg.
+
+    Parameters
+    ----------
+    frame : DataFrame
+        The table.
+    by : str, Series or list of str or Series
+        The keys of the groups, as for group_size.
+    column : str
+        The column to reduce.
+    func : str
+        The reduction, one of 'size', 'count', 'sum', 'mean', 'min' or
+        'max'. The missing values are ignored.
+
+    Returns
+    -------
+    result : Series
+        The reduction of the column per group.
+    """
+    if func not in AGGREGATIONS:
+        raise ValueError('func must be one of %s, got %r'
+                         % (', '.join(AGGREGATIONS), func))
+    codes, index = _group_codes(frame, by)
+    result = _reduce(codes, frame[column].to_numpy(), len(index), func)
+    return pd.Series(result, index=index, name=column)
+
+
+def group_transform(frame, by, column, func):
+    """A reduction of a column per group, given for each row of its group,
+    as frame.groupby(by)[column].transform(func).
+
+    Parameters
+    ----------
+    frame : DataFrame
+        The table.
+    by : str, Series or list of str or Series
+        The keys of the groups, as for group_size.
+    column : str
+        The column to reduce.
+    func : str
+        The reduction, as for group_agg.
+
+    Returns
+    -------
+    result : Series
+        The reduction of the group of each row, NaN for missing keys.
+    """
+    if func not in AGGREGATIONS:
+        raise ValueError('func must be one of %s, got %r'
+                         % (', '.join(AGGREGATIONS), func))
+    codes, index = _group_codes(frame, by)
+    result = _reduce(codes, frame[column].to_numpy(), len(index), func)
+    if func in ('size', 'count') and (codes >= 0).all():
+        return pd.Series(result[codes], index=frame.index, name=column)
+    result = np.append(result.astype(float), np.nan)[codes]
+    return pd.Series(result, index=frame.index, name=column)
+
+
+def value_counts(values):
+    """The number of occurrences of each value, as values.value_counts().
+
+    Parameters
+    ----------
+    values : Series
+        The values, for instance a categorical column loaded by load.
+
+    Returns
+    -------
+    counts : Series
+        The counts of the values, sorted by decreasing count. As with
+        pandas, the ties are in the order of the categories for a
+        categorical, which gives all its categories, and otherwise in the
+        order of the first occurrences.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes = values.cat.codes.to_numpy()
+        counts = np.bincount(codes[codes >= 0],
+                             minlength=len(values.cat.categories))
+        order = np.argsort(-counts, kind='stable')
+        index = pd.CategoricalIndex(
+            pd.Categorical.from_codes(order, dtype=values.dtype),
+            name=values.name)
+        return pd.Series(counts[order], index=index, name='count')
+    codes, levels = _encode(values)
+    # The levels found, with the position of their first occurrence
+    found, first, counts = np.unique(codes[codes >= 0], return_index=True,
+                                     return_counts=True)
+    order = np.lexsort((first, -counts))
+    return pd.Series(counts[order], index=pd.Index(levels[found[order]],
+                                                    name=values.name),
+                     name='count')
@@ -0,0 +1,232 @@
+"""
+Pivot tables of the movie tables, updated batch by batch.
+
+The reshaping exercises pivot the whole cast table::
+
+    cast.groupby(['year', 'character']).size().unstack().fillna(0)
+    cast.pivot_table(index='year', columns='type', values='n',
+                     aggfunc='mean')
+
+and so do the jobs appending new rows to it, every time. An
+IncrementalPivot rather holds the dense (index x columns) matrices of the
+number of rows, of the number of values and of their sum, and a batch of
+new rows only adds to the cells of its own (index, column) pairs. New index
+or column labels add rows or columns to the matrices, whose capacity
+doubles when full::
+
+    import pivots
+
+    pivot = pivots.IncrementalPivot('year', 'character')
+    for batch in batches:
+        pivot.update(batch)
+    pivot.unstack().fillna(0)
+
+The state can be saved after each batch, and loaded by the next job::
+
+    pivot.save('year-character.pivot')
+    pivot = pivots.IncrementalPivot.load('year-character.pivot')
+"""
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+AGGFUNCS = ('size', 'count', 'sum', 'mean')
+MATRICES = ('n_rows', 'counts', 'sums')
+
+
+class _Labels:
+    "Positions of the labels of an axis, in their order of arrival"
+
+    def __init__(self, labels=()):
+        self.labels = list(labels)
+        self.positions = {label: i for i, label in enumerate(self.labels)}
+
+    def __len__(self):
+        return len(self.labels)
+
+    def encode(self, values):
+        "Position of each value, adding the new labels, -1 for missing"
+        codes, uniques = pd.factorize(values)
+        mapping = np.empty(len(uniques) + 1, dtype=np.int64)
+        mapping[-1] = -1
+        for i, label in enumerate(uniques):
+            if isinstance(label, np.generic):
+                # Python scalars, to be saved as JSON
+                label = label.item()
+            if label not in self.positions:
+                self.positions[label] = len(self.labels)
+                self.labels.append(label)
+            mapping[i] = self.positions[label]
+        return mapping[codes]
+
+    def index(self, name):
+        "The labels as an Index, and their order once sorted"
+        index = pd.Index(self.labels, name=name)
+        return index, index.argsort()
+
+
+def _grow(matrix, shape):
+    "The matrix, with at least the given shape, its capacity doubling"
+    if matrix.shape[0] >= shape[0] and matrix.shape[1] >= shape[1]:
+        return matrix
+    capacity = tuple(max(size, 2 * current) if size > current else current
+                     for size, current in zip(shape, matrix.shape))
+    grown = np.zeros(capacity, dtype=matrix.dtype)
+    grown[:matrix.shape[0], :matrix.shape[1]] = matrix
+    return grown
+
+
+class IncrementalPivot:
+    """A pivot table of rows given batch by batch.
+
+    Parameters
+    ----------
+    index : str
+        The column whose values are the rows of the table, such as 'year'.
+    columns : str
+        The column whose values are the columns of the table, such as
+        'character' or 'type'.
+    values : str or None
+        The column to aggregate, None to count the rows.
+    aggfunc : str
+        The aggregation of the values, one of 'size' (the number of rows,
+        the default without values), 'count', 'sum' or 'mean' (the default
+        with values). The missing values are ignored.
+    """
+
+    def __init__(self, index, columns, values=None, aggfunc=None):
+        if aggfunc is None:
+            aggfunc = 'size' if values is None else 'mean'
+        if aggfunc not in AGGFUNCS:
+            raise ValueError('aggfunc must be one of %s, got %r'
+                             % (', '.join(AGGFUNCS), aggfunc))
+        if values is None and aggfunc != 'size':
+            raise ValueError('aggfunc %r requires values' % aggfunc)
+        self.index = index
+        self.columns = columns
+        self.values = values
+        self.aggfunc = aggfunc
+        self._index_labels = _Labels()
+        self._column_labels = _Labels()
+        self.n_rows = np.zeros((0, 0), dtype=np.int64)
+        self.counts = np.zeros((0, 0), dtype=np.int64)
+        self.sums = np.zeros((0, 0))
+
+    @property
+    def shape(self):
+        return len(self._index_labels), len(self._column_labels)
+
+    def update(self, batch):
+        """Add a batch of rows to the table.
+
+        Parameters
+        ----------
+        batch : DataFrame
+            The new rows, with the index, columns and values columns.
+
+        Returns
+        -------
+        self : IncrementalPivot
+        """
+        rows = self._index_labels.encode(batch[self.index])
+        columns = self._column_labels.encode(batch[self.columns])
+        # As groupby, the rows with a missing key are dropped
+        valid = (rows >= 0) & (columns >= 0)
+        for name in MATRICES:
+            setattr(self, name, _grow(getattr(self, name), self.shape))
+        n_columns = self.n_rows.shape[1]
+        # Only the cells of the batch are updated
+        cells, cell_codes = np.unique(rows[valid] * n_columns
+                                      + columns[valid],
+                                      return_inverse=True)
+        cell_rows, cell_columns = np.divmod(cells, n_columns)
+        self.n_rows[cell_rows, cell_columns] += np.bincount(
+            cell_codes, minlength=len(cells))
+        if self.values is not None:
+            values = batch[self.values].to_numpy(dtype=float)[valid]
+            present = ~np.isnan(values)
+            self.counts[cell_rows, cell_columns] += np.bincount(
+                cell_codes[present], minlength=len(cells))
+            self.sums[cell_rows, cell_columns] += np.bincount(
+                cell_codes[present], weights=values[present],
+                minlength=len(cells))
+        return self
+
+    def unstack(self):
+        """The table, as the unstacked result of a groupby.
+
+        Returns
+        -------
+        table : DataFrame
+            As df.groupby([index, columns])[values].agg(aggfunc).unstack()
+            for all the rows so far, with the labels sorted, and NaN for
+            the cells without rows.
+        """
+        index, index_order = self._index_labels.index(self.index)
+        columns, column_order = self._column_labels.index(self.columns)
+        n_index, n_columns = self.shape
+        n_rows = self.n_rows[:n_index, :n_columns]
+        if self.aggfunc == 'size':
+            table = n_rows.astype(float)
+        elif self.aggfunc == 'count':
+            table = self.counts[:n_index, :n_columns].astype(float)
+        elif self.aggfunc == 'sum':
+            table = self.sums[:n_index, :n_columns].copy()
+        else:
+            counts = self.counts[:n_index, :n_columns]
+            table = self.sums[:n_index, :n_columns] / np.where(
+                counts > 0, counts, np.nan)
+        table[n_rows == 0] = np.nan
+        # The labels only seen with a missing key have no group
+        index_order = index_order[n_rows.any(axis=1)[index_order]]
+        column_order = column_order[n_rows.any(axis=0)[column_order]]
+        table = pd.DataFrame(table[np.ix_(index_order, column_order)],
+                             index=index[index_order],
+                             columns=columns[column_order])
+        if self.aggfunc in ('size', 'count') and not table.isna().any(
+                axis=None):
+            table = table.astype(np.int64)
+        return table
+
+    def pivot_table(self, fill_value=None):
+        """The table, as df.pivot_table(index=index, columns=columns,
+        values=values, aggfunc=aggfunc, fill_value=fill_value)."""
+        table = self.unstack().dropna(how='all').dropna(axis=1, how='all')
+        if fill_value is not None:
+            table = table.fillna(fill_value)
+        return table
+
+    def save(self, directory):
+        "Save the state of the table, to be loaded by IncrementalPivot.load"
+        tmp_dir = directory + '.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        n_index, n_columns = self.shape
+        for name in MATRICES:
+            np.save(os.path.join(tmp_dir, name + '.npy'),
+                    getattr(self, name)[:n_index, :n_columns])
+        meta = {'index': self.index, 'columns': self.columns,
+                'values': self.values, 'aggfunc': self.aggfunc,
+                'index_labels': self._index_labels.labels,
+                'column_labels': self._column_labels.labels}
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=1)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.rename(tmp_dir, directory)
+
+    @classmethod
+    def load(cls, directory):
+        "An IncrementalPivot saved by save"
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        pivot = cls(meta['index'], meta['columns'], meta['values'],
+                    meta['aggfunc'])
+        pivot._index_labels = _Labels(meta['index_labels'])
+        pivot._column_labels = _Labels(meta['column_labels'])
+        for name in MATRICES:
+            setattr(pivot, name, np.load(os.path.join(directory,
+                                                      name + '.npy')))
+        return pivot
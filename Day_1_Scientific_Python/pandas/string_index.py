@@ -0,0 +1,271 @@
+"""
+Persistent index of the titles and names of the movie tables.
+
+The exercises filter the rows of the movie tables by their strings::
+
+    titles[titles['title'].str.contains('Hamlet')]
+    titles[titles['title'].str.startswith('The Life')]
+    titles['title'].str.len().nlargest(10)
+    cast[cast['name'] == 'Brad Pitt']
+
+each query comparing millions of Python strings. With the tables loaded by
+movies.load, a string column is made of codes into a sorted table of its
+distinct values. A StringIndex of the column answers these queries from:
+
+* the sorted table, searched with bisect, for equality and prefixes: the
+  values starting with a prefix have consecutive codes;
+* an inverted index of the trigrams of the distinct values, for
+  substrings: only the values holding all the trigrams of a substring are
+  compared to it;
+* the length of each distinct value;
+* the rows of each code, sorted by code, so that the rows of the matching
+  values are read without scanning the column.
+
+The index is built once, and saved in the cache of the table::
+
+    import movies
+    import string_index
+
+    titles = movies.load('titles')
+    index = string_index.load_index('titles', 'title')
+    titles.iloc[index.contains('Hamlet')]
+    titles.iloc[index.startswith('The Life')]
+    index.longest(10)
+    cast.iloc[string_index.load_index('cast', 'name').equals('Brad Pitt')]
+
+The queries return the positions of the matching rows, in increasing
+order, as the boolean filters do.
+"""
+from bisect import bisect_left
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+import movies
+
+NGRAM = 3
+# Bits per character in the key of a trigram, enough for any code point
+CHAR_BITS = 21
+# Larger than any character: the upper bound of the values with a prefix
+MAX_CHAR = chr(0x10ffff)
+INDEX_FILES = ('sorted_rows', 'offsets', 'lengths', 'ngrams', 'ngram_offsets',
+               'ngram_values')
+
+
+def _code_points(values):
+    """Code points of the values, concatenated, and the value of each of
+    them, -1 for the separators between values."""
+    text = '\0'.join(values)
+    points = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+    owners = np.cumsum(points == 0)
+    owners[points == 0] = -1
+    return points.astype(np.int64), owners
+
+
+def _ngram_keys(points, n=NGRAM):
+    "Key of the n-gram starting at each code point but the last n - 1 ones"
+    keys = np.zeros(len(points) - n + 1, dtype=np.int64)
+    for i in range(n):
+        keys = (keys << CHAR_BITS) | points[i:len(points) - n + 1 + i]
+    return keys
+
+
+def build_index(values, codes, directory):
+    """Build and save the index of a dictionary-encoded column.
+
+    Parameters
+    ----------
+    values : list of str
+        The distinct values of the column, sorted.
+    codes : ndarray of shape (n_rows,)
+        The code of the value of each row, -1 for missing values.
+    directory : str
+        Where to save the index.
+    """
+    codes = np.asarray(codes)
+    index_dtype = np.int32 if len(codes) < 2 ** 31 else np.int64
+    # Rows sorted by code, the rows of missing values first
+    rows = np.argsort(codes, kind='stable').astype(index_dtype)
+    counts = np.bincount(codes[codes >= 0], minlength=len(values))
+    offsets = np.concatenate([[0], np.cumsum(counts)]) + (codes < 0).sum()
+
+    points, owners = _code_points(values)
+    lengths = np.bincount(owners[owners >= 0], minlength=len(values))
+    if len(points) >= NGRAM:
+        keys = _ngram_keys(points)
+        # n-grams within a single value
+        valid = (owners[:len(keys)] >= 0) & (
+            owners[:len(keys)] == owners[NGRAM - 1:])
+        keys, owners = keys[valid], owners[:len(keys)][valid]
+    else:
+        keys, owners = np.empty(0, dtype=np.int64), owners[:0]
+    # The values of each n-gram, once each and sorted
+    order = np.lexsort((owners, keys))
+    keys, owners = keys[order], owners[order]
+    first = np.ones(len(keys), dtype=bool)
+    first[1:] = (keys[1:] != keys[:-1]) | (owners[1:] != owners[:-1])
+    keys, owners = keys[first], owners[first]
+    ngrams, ngram_starts = np.unique(keys, return_index=True)
+    ngram_offsets = np.append(ngram_starts, len(keys))
+
+    tmp_dir = directory + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    arrays = {'sorted_rows': rows, 'offsets': offsets,
+              'lengths': lengths.astype(np.int32), 'ngrams': ngrams,
+              'ngram_offsets': ngram_offsets,
+              'ngram_values': owners.astype(np.int32)}
+    for name in INDEX_FILES:
+        np.save(os.path.join(tmp_dir, name + '.npy'), arrays[name])
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+        json.dump({'n_rows': len(codes), 'n_values': len(values),
+                   'ngram': NGRAM}, f, indent=1)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.rename(tmp_dir, directory)
+
+
+def _ranges(starts, stops):
+    "The concatenation of the ranges from starts to stops"
+    sizes = stops - starts
+    shifts = np.repeat(starts - np.cumsum(sizes) + sizes, sizes)
+    return np.arange(sizes.sum()) + shifts
+
+
+class StringIndex:
+    """Equality, prefix, substring and length queries on a string column.
+
+    Parameters
+    ----------
+    values : list of str
+        The distinct values of the column, sorted.
+    directory : str
+        The directory of the index saved by build_index.
+    """
+
+    def __init__(self, values, directory):
+        self.values = values
+        self.directory = directory
+        for name in INDEX_FILES:
+            setattr(self, name, np.load(os.path.join(directory, name + '.npy'),
+                                        mmap_mode='r'))
+
+    def rows(self, codes):
+        "Positions of the rows of the given codes, in increasing order"
+        codes = np.asarray(codes, dtype=np.int64)
+        if len(codes) == 0:
+            return np.empty(0, dtype=np.int64)
+        starts, stops = self.offsets[codes], self.offsets[codes + 1]
+        if (codes[1:] == codes[:-1] + 1).all():
+            # Consecutive codes, e.g. a prefix: a single slice of rows
+            return np.sort(self.sorted_rows[starts[0]:stops[-1]])
+        return np.sort(self.sorted_rows[_ranges(starts, stops)])
+
+    def _range(self, low, high):
+        "Codes of the values between low (included) and high (excluded)"
+        return np.arange(bisect_left(self.values, low),
+                         bisect_left(self.values, high))
+
+    def equals(self, value):
+        "Positions of the rows equal to value, as column == value"
+        return self.rows(self._range(value, value + '\0'))
+
+    def startswith(self, prefix):
+        "Positions of the rows starting with prefix, as str.startswith"
+        return self.rows(self._range(prefix, prefix + MAX_CHAR))
+
+    def contains(self, substring):
+        """Positions of the rows holding substring, as
+        str.contains(substring, regex=False)."""
+        return self.rows(self.contains_values(substring))
+
+    def contains_values(self, substring):
+        "Codes of the values holding substring"
+        if len(substring) < NGRAM:
+            # Still a scan of the distinct values only, not of the rows
+            values = pd.Series(self.values, dtype=object)
+            return np.flatnonzero(values.str.contains(substring,
+                                                      regex=False))
+        points = np.frombuffer(substring.encode('utf-32-le'),
+                               dtype=np.uint32).astype(np.int64)
+        candidates = None
+        for key in np.unique(_ngram_keys(points)):
+            i = np.searchsorted(self.ngrams, key)
+            if i == len(self.ngrams) or self.ngrams[i] != key:
+                return np.empty(0, dtype=np.int64)
+            found = self.ngram_values[self.ngram_offsets[i]:
+                                      self.ngram_offsets[i + 1]]
+            candidates = found if candidates is None else np.intersect1d(
+                candidates, found, assume_unique=True)
+        # The trigrams may be found in another order: check the candidates
+        return np.array([code for code in candidates
+                         if substring in self.values[code]], dtype=np.int64)
+
+    def lengths_of(self, codes):
+        "Length of the value of each code, NaN for missing values"
+        codes = np.asarray(codes)
+        return np.where(codes >= 0, self.lengths[codes], np.nan)
+
+    def longest(self, n):
+        """The n longest values, as str.len().nlargest(n).
+
+        Returns
+        -------
+        lengths : Series
+            The lengths of the n longest values, indexed by the positions
+            of their rows, the first rows first for equal lengths.
+        """
+        lengths = np.asarray(self.lengths)
+        by_length = np.argsort(-lengths, kind='stable')
+        counts = np.diff(self.offsets)
+        # Enough values for n rows, and all the ones as long as the last one
+        n_values = np.searchsorted(np.cumsum(counts[by_length]), n) + 1
+        if n_values < len(by_length):
+            n_values = np.searchsorted(-lengths[by_length],
+                                       -lengths[by_length[n_values - 1]],
+                                       side='right')
+        codes = by_length[:n_values]
+        rows = self.sorted_rows[_ranges(self.offsets[codes],
+                                        self.offsets[codes + 1])]
+        row_lengths = np.repeat(lengths[codes], counts[codes])
+        order = np.lexsort((rows, -row_lengths))[:n]
+        return pd.Series(row_lengths[order], index=rows[order])
+
+
+def load_index(name, column, data_dir=movies.DATA_DIR):
+    """The index of a string column of a movie table, built if needed.
+
+    Parameters
+    ----------
+    name : str
+        The table, 'cast' or 'titles', or the path of another CSV file.
+    column : str
+        The string column, such as 'title' or 'name'.
+    data_dir : str
+        The directory of the CSV files of the tables.
+
+    Returns
+    -------
+    index : StringIndex
+        The index, saved in the cache of the table, and rebuilt with it.
+    """
+    # Also refreshes the cache of the table
+    values = movies.load(name, [column], data_dir)[column]
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        raise ValueError('Column %r of %s is not a string column'
+                         % (column, name))
+    directory = os.path.join(movies.cache_dir(name, data_dir),
+                             '%s.index' % column)
+    categories = list(values.cat.categories)
+    meta_path = os.path.join(directory, 'meta.json')
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if (meta['n_rows'], meta['n_values']) != (len(values),
+                                                  len(categories)):
+            shutil.rmtree(directory)
+    if not os.path.exists(meta_path):
+        build_index(categories, values.cat.codes.to_numpy(), directory)
+    return StringIndex(categories, directory)
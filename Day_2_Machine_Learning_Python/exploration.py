@@ -0,0 +1,256 @@
+"""
+Pairplots of a whole dataset, as density images.
+
+sns.pairplot draws a marker per sample: beyond a few thousand samples, it is
+slow and the markers hide each other. density_pairplot rather counts the
+samples of each class of the hue in the bins of a 2D histogram per pair of
+variables, chunk by chunk with NumPy, and draws each histogram as a single
+image, whose color is the mix of the colors of the classes in the bin and
+whose opacity grows with the number of samples. The cost of the figure
+depends on the number of bins, not on the number of samples::
+
+    import exploration
+
+    columns = ['age', 'education-num', 'hours-per-week']
+    _ = exploration.density_pairplot(adult_census, vars=columns,
+                                     hue='class')
+
+The data can also be given as an iterable of DataFrame chunks, for instance
+``pd.read_csv(..., chunksize=100000)``, with the ranges of the variables.
+"""
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from matplotlib.colors import to_rgb
+from matplotlib.patches import Patch
+
+CHUNKSIZE = 100000
+
+
+def _iter_chunks(data, chunksize):
+    if isinstance(data, pd.DataFrame):
+        for start in range(0, len(data), chunksize):
+            yield data.iloc[start:start + chunksize]
+    else:
+        yield from data
+
+
+def _edges(values_range, bins, integer):
+    "Edges of the bins of a variable, holding whole integers if integer"
+    low, high = values_range
+    if integer:
+        # Bins of equal width, rather than aliasing stripes
+        width = -(-(high - low + 1) // bins)
+        return np.arange(low - .5, high + width, width)
+    if low == high:
+        low, high = low - .5, high + .5
+    return np.linspace(low, high, bins + 1)
+
+
+def _bin_codes(values, edges):
+    "Bin of each value, -1 outside of the edges or for missing values"
+    values = np.asarray(values, dtype=float)
+    codes = np.searchsorted(edges, values, side='right') - 1
+    # The last edge is included in the last bin
+    codes[values == edges[-1]] = len(edges) - 2
+    codes[~((values >= edges[0]) & (values <= edges[-1]))] = -1
+    return codes
+
+
+def density_histograms(data, vars, hue, bins=50, ranges=None,
+                       chunksize=CHUNKSIZE):
+    """Histograms of the variables and their pairs, per class of the hue.
+
+    Parameters
+    ----------
+    data : DataFrame or iterable of DataFrame
+        The data, or chunks of the data.
+    vars : list of str
+        The numerical variables.
+    hue : str
+        The variable giving the class of the samples.
+    bins : int
+        The maximum number of bins of each variable. The bins of the integer
+        variables hold the same number of integers.
+    ranges : dict or None
+        The (min, max) of each variable, found in the data by default. It
+        is required for an iterable of chunks. The values outside of the
+        range are ignored.
+    chunksize : int
+        The number of rows counted at once, for a DataFrame.
+
+    Returns
+    -------
+    edges : dict of ndarray
+        The edges of the bins of each variable.
+    classes : list
+        The classes of the hue.
+    counts : dict of ndarray
+        For each variable, the counts of shape (n_classes, n_bins), and for
+        each pair (x, y) of distinct variables, the counts of shape
+        (n_classes, n_bins_x, n_bins_y).
+    """
+    if ranges is None:
+        if not isinstance(data, pd.DataFrame):
+            raise ValueError('The ranges of the variables are required for '
+                             'an iterable of chunks')
+        ranges = {name: (data[name].min(), data[name].max())
+                  for name in vars}
+    edges = dict()
+    for name in vars:
+        integer = (isinstance(data, pd.DataFrame)
+                   and pd.api.types.is_integer_dtype(data[name]))
+        edges[name] = _edges(ranges[name], bins, integer)
+    n_bins = {name: len(edges[name]) - 1 for name in vars}
+
+    classes = list()
+    if (isinstance(data, pd.DataFrame)
+            and isinstance(data[hue].dtype, pd.CategoricalDtype)):
+        classes = list(data[hue].cat.categories)
+    counts = {name: np.zeros((0, n_bins[name]), dtype=np.int64)
+              for name in vars}
+    pairs = [(x, y) for x in vars for y in vars if x != y]
+    for x, y in pairs:
+        counts[x, y] = np.zeros((0, n_bins[x], n_bins[y]), dtype=np.int64)
+
+    for chunk in _iter_chunks(data, chunksize):
+        hue_codes, hue_classes = pd.factorize(chunk[hue])
+        # Codes of the chunk -> codes of all the chunks so far
+        new = [value for value in hue_classes if value not in classes]
+        classes.extend(new)
+        class_index = pd.Index(classes)
+        hue_codes = np.append(class_index.get_indexer(hue_classes),
+                              -1)[hue_codes]
+        n_classes = len(classes)
+        for name in counts:
+            shape = counts[name].shape
+            if shape[0] < n_classes:
+                counts[name] = np.concatenate(
+                    [counts[name],
+                     np.zeros((n_classes - shape[0],) + shape[1:],
+                              dtype=np.int64)])
+        codes = {name: _bin_codes(chunk[name], edges[name]) for name in vars}
+        for name in vars:
+            valid = (hue_codes >= 0) & (codes[name] >= 0)
+            flat = hue_codes[valid] * n_bins[name] + codes[name][valid]
+            counts[name] += np.bincount(
+                flat, minlength=n_classes * n_bins[name]).reshape(
+                    n_classes, n_bins[name])
+        for x, y in pairs:
+            if x > y:
+                # The transpose of the histogram of (y, x)
+                continue
+            valid = (hue_codes >= 0) & (codes[x] >= 0) & (codes[y] >= 0)
+            flat = ((hue_codes[valid] * n_bins[x] + codes[x][valid])
+                    * n_bins[y] + codes[y][valid])
+            counts[x, y] += np.bincount(
+                flat, minlength=n_classes * n_bins[x] * n_bins[y]).reshape(
+                    n_classes, n_bins[x], n_bins[y])
+    for x, y in pairs:
+        if x > y:
+            counts[x, y] = counts[y, x].transpose(0, 2, 1)
+    return edges, classes, counts
+
+
+def density_image(counts, colors):
+    """RGBA image of the counts of a 2D histogram per class.
+
+    The color of a bin is the mix of the colors of its classes, weighted by
+    their counts, and its opacity is the log of its total count, relative to
+    the largest one.
+
+    Parameters
+    ----------
+    counts : ndarray of shape (n_classes, n_bins_x, n_bins_y)
+        The counts.
+    colors : list of color
+        The color of each class.
+
+    Returns
+    -------
+    image : ndarray of shape (n_bins_y, n_bins_x, 4)
+        The image, with y along the rows, for imshow(origin='lower').
+    """
+    colors = np.array([to_rgb(color) for color in colors])
+    total = counts.sum(axis=0)
+    image = np.zeros(total.shape + (4,))
+    image[..., :3] = (np.tensordot(counts, colors, axes=(0, 0))
+                      / np.maximum(total, 1)[..., np.newaxis])
+    if total.max() > 0:
+        image[..., 3] = np.log1p(total) / np.log1p(total.max())
+    return image.transpose(1, 0, 2)
+
+
+def density_pairplot(data, vars=None, hue=None, x_vars=None, y_vars=None,
+                     bins=50, ranges=None, palette=None, height=4,
+                     chunksize=CHUNKSIZE):
+    """Pairplot of the density of the samples of each class of the hue.
+
+    As sns.pairplot(data, vars=vars, hue=hue, diag_kind='hist'), but with
+    the samples counted in bins, so that all of them can be plotted.
+
+    Parameters
+    ----------
+    data : DataFrame or iterable of DataFrame
+        The data, or chunks of the data.
+    vars : list of str or None
+        The numerical variables, in both rows and columns.
+    hue : str
+        The variable giving the class of the samples.
+    x_vars, y_vars : str, list of str or None
+        The variables of the columns and of the rows, vars by default.
+    bins : int
+        The number of bins of each variable.
+    ranges : dict or None
+        The (min, max) of each variable, found in the data by default.
+    palette : list of color or None
+        The color of each class, the default color cycle by default.
+    height : float
+        The height of each plot, in inches.
+    chunksize : int
+        The number of rows counted at once, for a DataFrame.
+
+    Returns
+    -------
+    fig : Figure
+        The figure.
+    axes : ndarray of Axes of shape (len(y_vars), len(x_vars))
+        The plots.
+    """
+    if hue is None:
+        raise ValueError('The hue variable is required')
+    x_vars = [x_vars] if isinstance(x_vars, str) else x_vars or vars
+    y_vars = [y_vars] if isinstance(y_vars, str) else y_vars or vars
+    if x_vars is None or y_vars is None:
+        raise ValueError('Either vars, or x_vars and y_vars are required')
+    all_vars = list(dict.fromkeys(list(x_vars) + list(y_vars)))
+    edges, classes, counts = density_histograms(
+        data, all_vars, hue, bins=bins, ranges=ranges, chunksize=chunksize)
+    if palette is None:
+        palette = ['C%d' % (i % 10) for i in range(len(classes))]
+
+    fig, axes = plt.subplots(len(y_vars), len(x_vars), squeeze=False,
+                             figsize=(height * len(x_vars),
+                                      height * len(y_vars)))
+    for i, y in enumerate(y_vars):
+        for j, x in enumerate(x_vars):
+            ax = axes[i, j]
+            if x == y:
+                for class_counts, color in zip(counts[x], palette):
+                    ax.stairs(class_counts, edges[x], fill=True,
+                              alpha=.5, color=color)
+            else:
+                ax.imshow(density_image(counts[x, y], palette),
+                          origin='lower', aspect='auto',
+                          interpolation='nearest',
+                          extent=(edges[x][0], edges[x][-1],
+                                  edges[y][0], edges[y][-1]))
+            if i == len(y_vars) - 1:
+                ax.set_xlabel(x)
+            if j == 0:
+                ax.set_ylabel(y)
+    fig.legend(handles=[Patch(color=color, label=str(label))
+                        for label, color in zip(classes, palette)],
+               title=hue, loc='center left', bbox_to_anchor=(.9, .5))
+    fig.tight_layout(rect=(0, 0, .9, 1))
+    return fig, axes
@@ -1,18 +1,27 @@
-import numpy as np
+import os
+import sys
 
-import pandas as pd
+import numpy as np
 
 import matplotlib.pyplot as plt
 from matplotlib.pyplot import cm
 from matplotlib.colors import ListedColormap
+from matplotlib.collections import PatchCollection
+from matplotlib.patches import Rectangle
 
 import seaborn as sns
 
 from sklearn.preprocessing import LabelEncoder
 from sklearn.tree import DecisionTreeClassifier
 
-adult_census = pd.read_csv(
-    "https://www.openml.org/data/get_csv/1595261/adult-census.csv")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, os.pardir))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+from datasets import load_adult_census  # noqa: E402
+import exploration  # noqa: E402
+
+adult_census = load_adult_census()
 
 target_column = 'class'
 
@@ -29,9 +38,9 @@ adult_census = adult_census[all_columns]
 
 n_samples_to_plot = 5000
 columns = ['age', 'education-num', 'hours-per-week']
-_ = sns.pairplot(data=adult_census[:n_samples_to_plot], vars=columns,
-                 hue=target_column, plot_kws={'alpha': 0.2},
-                 height=4, diag_kind='hist')
+# All the samples, as densities
+_ = exploration.density_pairplot(adult_census, vars=columns,
+                                 hue=target_column, height=4)
 
 _ = sns.pairplot(data=adult_census[:n_samples_to_plot], x_vars='age',
                  y_vars='hours-per-week', hue=target_column,
@@ -46,9 +55,55 @@ colors = np.vstack([bottom(np.linspace(0, 1, 128)),
 blue_orange_cmap = ListedColormap(colors, name='BlueOrange')
 
 
+def leaf_boxes(tree, bounds):
+    """The rectangles of the leaves of a fitted tree on 2 features.
+
+    The thresholds of the splits are read from `tree.tree_`: the samples
+    whose feature is lower or equal to the threshold go to the left child.
+
+    Returns a list of `(x_min, x_max, y_min, y_max, leaf)` tuples.
+    """
+    tree_ = tree.tree_
+    boxes = []
+    stack = [(0, list(bounds))]
+    while stack:
+        node, box = stack.pop()
+        if tree_.children_left[node] == -1:
+            boxes.append((*box, node))
+            continue
+        feature = tree_.feature[node]
+        threshold = tree_.threshold[node]
+        left, right = list(box), list(box)
+        # box is [x_min, x_max, y_min, y_max]
+        left[2 * feature + 1] = min(box[2 * feature + 1], threshold)
+        right[2 * feature] = max(box[2 * feature], threshold)
+        for child, child_box in [(tree_.children_left[node], left),
+                                 (tree_.children_right[node], right)]:
+            # Skip the leaves outside of the plot
+            if (child_box[0] < child_box[1]
+                    and child_box[2] < child_box[3]):
+                stack.append((child, child_box))
+    return boxes
+
+
+def tiled_predict_proba(estimator, xx, yy, tile_size=250000):
+    "The probability of the positive class on a grid, tile by tile"
+    Z = np.empty(xx.shape, dtype=np.float32)
+    xx, yy, Z_flat = xx.ravel(), yy.ravel(), Z.ravel()
+    for start in range(0, len(xx), tile_size):
+        tile = slice(start, start + tile_size)
+        Z_flat[tile] = estimator.predict_proba(
+            np.c_[xx[tile], yy[tile]])[:, 1]
+    return Z
+
+
 def plot_tree_decision_function(tree, X, y, ax):
     """Plot the different decision rules found by a `DecisionTreeClassifier`.
 
+    The leaves of the tree are drawn as rectangles, computed from the
+    thresholds of the tree, whatever the resolution of the figure. Other
+    classifiers are evaluated on a grid, tile by tile.
+
     Parameters
     ----------
     tree : DecisionTreeClassifier instance
@@ -60,28 +115,34 @@ def plot_tree_decision_function(tree, X, y, ax):
     ax : matplotlib axis
         The matplotlib axis where to plot the different decision rules.
     """
-    import numpy as np
-    from scipy import ndimage
-
-    h = 0.02
     x_min, x_max = 0, 100
     y_min, y_max = 0, 100
-    xx, yy = np.meshgrid(np.arange(x_min, x_max, h),
-                         np.arange(y_min, y_max, h))
-
-    Z = tree.predict_proba(np.c_[xx.ravel(), yy.ravel()])[:, 1]
-    Z = Z.reshape(xx.shape)
-    faces = tree.tree_.apply(
-        np.c_[xx.ravel(), yy.ravel()].astype(np.float32))
-    faces = faces.reshape(xx.shape)
-    border = ndimage.laplace(faces) != 0
     ax.scatter(X.iloc[:, 0], X.iloc[:, 1],
                c=np.array(['tab:blue',
                            'tab:orange'])[y], s=60, alpha=0.7, vmin=0, vmax=1)
-    levels = np.linspace(0, 1, 101)
-    contours = ax.contourf(xx, yy, Z, levels=levels, alpha=.4, cmap=blue_orange_cmap)
-    ax.get_figure().colorbar(contours, ticks=np.linspace(0, 1, 11))
-    ax.scatter(xx[border], yy[border], marker='.', s=1)
+    if hasattr(tree, 'tree_'):
+        boxes = leaf_boxes(tree, (x_min, x_max, y_min, y_max))
+        value = tree.tree_.value[:, 0, :]
+        proba = value[:, 1] / value.sum(axis=1)
+        regions = PatchCollection(
+            [Rectangle((x0, y0), x1 - x0, y1 - y0)
+             for x0, x1, y0, y1, _ in boxes],
+            cmap=blue_orange_cmap, alpha=.4, edgecolor='tab:blue',
+            linewidth=1)
+        regions.set_array(proba[[leaf for *_, leaf in boxes]])
+        regions.set_clim(0, 1)
+        ax.add_collection(regions)
+    else:
+        h = 0.02
+        xx, yy = np.meshgrid(np.arange(x_min, x_max, h),
+                             np.arange(y_min, y_max, h))
+        Z = tiled_predict_proba(tree, xx, yy)
+        levels = np.linspace(0, 1, 101)
+        regions = ax.contourf(xx, yy, Z, levels=levels, alpha=.4,
+                              cmap=blue_orange_cmap)
+        ax.contour(xx, yy, Z, levels=[.5], colors='tab:blue',
+                   linewidths=1)
+    ax.get_figure().colorbar(regions, ticks=np.linspace(0, 1, 11))
     ax.set_xlabel(X.columns[0])
     ax.set_ylabel(X.columns[1])
     ax.set_xlim([x_min, x_max])
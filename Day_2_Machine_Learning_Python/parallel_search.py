@@ -0,0 +1,296 @@
+"""
+Parallel hyper-parameters search, with the data shared by the workers.
+
+With n_jobs, GridSearchCV pickles the training data and sends them to a
+worker for every (candidate, fold) task, which takes most of the time for
+large DataFrames. Here the data are written once as .npy files, in shared
+memory (/dev/shm) when available, and each worker of a persistent pool
+memory-maps them once. A task is then only given the parameters of its
+candidate and the indices of its fold. The results are yielded as soon as
+they complete::
+
+    import parallel_search
+    from sklearn.model_selection import ParameterGrid
+
+    candidates = list(ParameterGrid(param_grid))
+    with parallel_search.SharedData(df_train, target_train, n_jobs=4) as data:
+        results = []
+        for result in data.iter_search(model, candidates, cv=5):
+            results.append(result)
+            # The results so far, in the format of GridSearchCV.cv_results_
+            cv_results = parallel_search.cv_results(results, candidates)
+
+The DataFrames are rebuilt by the workers with their index and dtypes, so
+that the folds of a tuning.CachedTransformer are still recognized there.
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import json
+import os
+import shutil
+import tempfile
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone, is_classifier
+from sklearn.exceptions import FitFailedWarning
+from sklearn.metrics import check_scoring
+from sklearn.model_selection import check_cv
+
+SHM_DIR = '/dev/shm'
+
+# The data of a worker process, loaded once by _init_worker
+_worker_data = {}
+
+
+def _save_values(directory, name, values, meta):
+    "Save an array, with its strings as categorical codes"
+    values = pd.Series(values)
+    entry = {'name': name, 'dtype': str(values.dtype)}
+    if values.dtype.kind in 'biufcmM':
+        np.save(os.path.join(directory, '%d.npy' % len(meta)),
+                values.to_numpy())
+        entry['kind'] = 'values'
+    else:
+        categorical = values.astype('category').array
+        np.save(os.path.join(directory, '%d.npy' % len(meta)),
+                categorical.codes)
+        entry['kind'] = 'categorical'
+        entry['categories'] = categorical.categories.tolist()
+    meta.append(entry)
+
+
+def _load_values(directory, i, entry):
+    "Load an array saved by _save_values, as a read-only memory map"
+    values = np.load(os.path.join(directory, '%d.npy' % i), mmap_mode='r')
+    if entry['kind'] == 'values':
+        return np.asarray(values)
+    categorical = pd.Categorical.from_codes(np.asarray(values),
+                                            entry['categories'])
+    if entry['dtype'] == 'category':
+        return categorical
+    return pd.Series(categorical).astype(entry['dtype']).array
+
+
+def _save_data(directory, X, y):
+    meta = {'columns': [], 'target': []}
+    if isinstance(X, pd.DataFrame):
+        meta['frame'] = True
+        meta['index_names'] = list(X.index.names)
+        for level in range(X.index.nlevels):
+            _save_values(directory, None,
+                         X.index.get_level_values(level), meta['columns'])
+        meta['n_index'] = X.index.nlevels
+        for name, column in X.items():
+            _save_values(directory, name, column, meta['columns'])
+    else:
+        meta['frame'] = False
+        np.save(os.path.join(directory, 'X.npy'), np.asarray(X))
+    target_dir = os.path.join(directory, 'target')
+    os.makedirs(target_dir)
+    _save_values(target_dir, None, np.asarray(y), meta['target'])
+    with open(os.path.join(directory, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=1)
+
+
+def _load_data(directory):
+    with open(os.path.join(directory, 'meta.json')) as f:
+        meta = json.load(f)
+    y = np.asarray(_load_values(os.path.join(directory, 'target'), 0,
+                                meta['target'][0]))
+    if not meta['frame']:
+        X = np.load(os.path.join(directory, 'X.npy'), mmap_mode='r')
+        return np.asarray(X), y
+    arrays = [_load_values(directory, i, entry)
+              for i, entry in enumerate(meta['columns'])]
+    n_index = meta['n_index']
+    index = pd.MultiIndex.from_arrays(arrays[:n_index],
+                                      names=meta['index_names'])
+    if n_index == 1:
+        index = index.get_level_values(0)
+    columns = [entry['name'] for entry in meta['columns'][n_index:]]
+    X = pd.DataFrame(dict(zip(columns, arrays[n_index:])), index=index,
+                     copy=False)
+    return X, y
+
+
+def _init_worker(directory):
+    _worker_data['X'], _worker_data['y'] = _load_data(directory)
+
+
+def _fit_and_score(model, params, train, test, scoring):
+    "Fit a candidate on a fold of the data of the worker, and score it"
+    X, y = _worker_data['X'], _worker_data['y']
+    index = X.iloc if isinstance(X, pd.DataFrame) else X
+    model = clone(model).set_params(**params)
+    result = {}
+    start = time.time()
+    try:
+        model.fit(index[train], y[train])
+    except Exception as e:
+        result.update(test_score=np.nan, error=repr(e),
+                      fit_time=time.time() - start, score_time=0.)
+        return result
+    result['fit_time'] = time.time() - start
+    start = time.time()
+    result['test_score'] = check_scoring(model, scoring)(
+        model, index[test], y[test])
+    result['score_time'] = time.time() - start
+    return result
+
+
+class SharedData:
+    """Training data shared by a pool of worker processes.
+
+    The data are saved once, and memory-mapped once by each worker of the
+    pool, for all the searches run on them. Use it as a context manager, or
+    call close to stop the workers and remove the files.
+
+    Parameters
+    ----------
+    X : DataFrame or ndarray of shape (n_samples, n_features)
+        The training data.
+    y : ndarray of shape (n_samples,)
+        The training target.
+    n_jobs : int or None
+        The number of worker processes, one per CPU by default.
+    directory : str or None
+        Where to save the data, in shared memory by default when available.
+    """
+
+    def __init__(self, X, y, n_jobs=None, directory=None):
+        if directory is None and os.path.isdir(SHM_DIR):
+            directory = SHM_DIR
+        self.X, self.y = X, np.asarray(y)
+        self.directory = tempfile.mkdtemp(prefix='parallel_search_',
+                                          dir=directory)
+        try:
+            _save_data(self.directory, X, self.y)
+        except BaseException:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            raise
+        self.executor = ProcessPoolExecutor(
+            max_workers=n_jobs, initializer=_init_worker,
+            initargs=(self.directory,))
+        # The tasks of the searches not completed yet
+        self._futures = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        "Stop the workers and remove the files of the data"
+        # shutdown(cancel_futures=True) requires Python 3.9
+        for future in self._futures:
+            future.cancel()
+        self.executor.shutdown(wait=True)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def iter_search(self, model, candidates, cv=5, scoring=None):
+        """Evaluate candidates by cross-validation, yielding the results.
+
+        Parameters
+        ----------
+        model : estimator
+            The model, for instance a pipeline.
+        candidates : list of dict
+            The parameters of the candidates, for instance from
+            sklearn.model_selection.ParameterGrid or ParameterSampler.
+        cv : int or cross-validation generator
+            The cross-validation splitting strategy, as for GridSearchCV.
+        scoring : str, callable or None
+            The score, the one of the model by default.
+
+        Yields
+        ------
+        result : dict
+            The result of a candidate on a fold, as soon as it is available,
+            with its 'candidate' and 'split' numbers, its 'test_score',
+            'fit_time' and 'score_time', and the 'error' raised by the fit
+            if it failed (then the score is NaN).
+        """
+        cv = check_cv(cv, self.y, classifier=is_classifier(model))
+        splits = list(cv.split(self.X, self.y))
+        futures = {}
+        for i, params in enumerate(candidates):
+            for k, (train, test) in enumerate(splits):
+                future = self.executor.submit(_fit_and_score, model, params,
+                                              train, test, scoring)
+                futures[future] = i, k
+        self._futures.update(futures)
+        try:
+            for future in as_completed(futures):
+                result = future.result()
+                result['candidate'], result['split'] = futures[future]
+                result['n_splits'] = len(splits)
+                if 'error' in result:
+                    warnings.warn('Fit of candidate %d failed on split %d: '
+                                  '%s' % (*futures[future], result['error']),
+                                  FitFailedWarning)
+                yield result
+        finally:
+            # Stopped early: do not run the remaining tasks
+            for future in futures:
+                future.cancel()
+            self._futures.difference_update(futures)
+
+
+def cv_results(results, candidates):
+    """The results of a search so far, in the format of cv_results_.
+
+    Parameters
+    ----------
+    results : list of dict
+        The results yielded by SharedData.iter_search.
+    candidates : list of dict
+        The parameters of the candidates given to iter_search.
+
+    Returns
+    -------
+    cv_results : dict of ndarray
+        The results, as the cv_results_ of GridSearchCV. The mean scores
+        of the candidates not evaluated on all the splits yet, or whose
+        fit failed, are NaN, and these candidates are ranked last, as in
+        scikit-learn.
+    """
+    n_splits = results[0]['n_splits'] if results else 0
+    scores = np.full((len(candidates), n_splits), np.nan)
+    fit_times = np.full((len(candidates), n_splits), np.nan)
+    score_times = np.full((len(candidates), n_splits), np.nan)
+    done = np.zeros((len(candidates), n_splits), dtype=bool)
+    for result in results:
+        i, k = result['candidate'], result['split']
+        scores[i, k] = result['test_score']
+        fit_times[i, k] = result['fit_time']
+        score_times[i, k] = result['score_time']
+        done[i, k] = True
+    complete = done.all(axis=1)
+
+    cv_results = {'params': list(candidates)}
+    for name in sorted({name for params in candidates for name in params}):
+        values = np.ma.masked_all(len(candidates), dtype=object)
+        for i, params in enumerate(candidates):
+            if name in params:
+                values[i] = params[name]
+        cv_results['param_' + name] = values
+    for k in range(n_splits):
+        cv_results['split%d_test_score' % k] = scores[:, k]
+    with warnings.catch_warnings():
+        # Candidates without any result yet
+        warnings.simplefilter('ignore', RuntimeWarning)
+        cv_results['mean_fit_time'] = np.nanmean(fit_times, axis=1)
+        cv_results['std_fit_time'] = np.nanstd(fit_times, axis=1)
+        cv_results['mean_score_time'] = np.nanmean(score_times, axis=1)
+        cv_results['std_score_time'] = np.nanstd(score_times, axis=1)
+    mean_scores = np.where(complete, scores.mean(axis=1), np.nan)
+    cv_results['mean_test_score'] = mean_scores
+    cv_results['std_test_score'] = np.where(complete, scores.std(axis=1),
+                                            np.nan)
+    ranks = pd.Series(mean_scores).rank(method='min', ascending=False,
+                                        na_option='bottom')
+    cv_results['rank_test_score'] = ranks.to_numpy().astype(np.int32)
+    return cv_results
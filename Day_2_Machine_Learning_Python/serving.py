@@ -0,0 +1,273 @@
+"""
+Predictions of the fitted census pipelines on a stream of records.
+
+The notebooks predict whole DataFrames at once. To serve a pipeline such as
+``make_pipeline(ColumnTransformer(...), LogisticRegression())`` to a stream
+of records, the records are gathered in micro-batches, each of them being
+predicted at once::
+
+    import serving
+
+    predictor = serving.BatchPredictor(model, batch_size=256)
+    for predictions in predictor.predict(records):
+        ...
+    predictor.latency_percentiles()
+
+The records are row dicts, such as ``data_test.to_dict('records')``, or
+DataFrame chunks. With compiled=True, the ColumnTransformer is replaced by
+NumPy lookup tables built from its fitted encoders (a sorted array of the
+categories, searched with np.searchsorted) and scalers, so that a batch goes
+from the records to the final estimator without building any DataFrame.
+"""
+import itertools
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.preprocessing import (FunctionTransformer, OneHotEncoder,
+                                   OrdinalEncoder, StandardScaler)
+
+BATCH_SIZE = 1024
+
+
+def iter_batches(records, batch_size=BATCH_SIZE):
+    """Gather a stream of records in batches of batch_size records.
+
+    Parameters
+    ----------
+    records : iterable of dict or DataFrame
+        The records, one row dict at a time, or DataFrame chunks of any
+        size.
+    batch_size : int
+        The number of records per batch.
+
+    Yields
+    ------
+    batch : dict of list or DataFrame
+        The columns of the records of the batch, as lists for row dicts (the
+        last batch may be smaller).
+    """
+    records = iter(records)
+    first = next(records, None)
+    if first is None:
+        return
+    records = itertools.chain([first], records)
+    if not isinstance(first, pd.DataFrame):
+        # Row dicts: gather them column by column
+        while True:
+            rows = list(itertools.islice(records, batch_size))
+            if not rows:
+                return
+            yield {column: [row[column] for row in rows]
+                   for column in rows[0]}
+
+    pending, n_pending = list(), 0
+    for chunk in records:
+        while len(chunk):
+            part = chunk.iloc[:batch_size - n_pending]
+            chunk = chunk.iloc[len(part):]
+            pending.append(part)
+            n_pending += len(part)
+            if n_pending == batch_size:
+                yield pd.concat(pending) if len(pending) > 1 else pending[0]
+                pending, n_pending = list(), 0
+    if pending:
+        yield pd.concat(pending)
+
+
+def _column(batch, name):
+    "The values of a column of a batch, as an array"
+    values = batch[name]
+    if isinstance(values, pd.Series):
+        return values.to_numpy()
+    return np.asarray(values)
+
+
+class _Lookup:
+    "Codes of categories, with a sorted array searched by np.searchsorted"
+
+    def __init__(self, categories):
+        categories = np.asarray(categories)
+        if all(isinstance(category, str) for category in categories):
+            categories = categories.astype(str)
+        self.order = np.argsort(categories, kind='stable')
+        self.keys = categories[self.order]
+
+    def codes(self, values):
+        "Code of each value, -1 for unknown values"
+        values = np.asarray(values)
+        if self.keys.dtype.kind == 'U':
+            values = values.astype(str)
+        positions = np.searchsorted(self.keys, values)
+        positions = np.minimum(positions, len(self.keys) - 1)
+        found = self.keys[positions] == values
+        return np.where(found, self.order[positions], -1)
+
+
+def _compile_transformer(transformer, columns):
+    "A function mapping a batch to the output of a fitted transformer"
+    if transformer == 'passthrough' or (
+            # The remainder='passthrough' of recent scikit-learn versions
+            isinstance(transformer, FunctionTransformer)
+            and transformer.func is None):
+        return lambda batch: np.column_stack(
+            [_column(batch, name).astype(float) for name in columns])
+    if isinstance(transformer, StandardScaler):
+        mean = transformer.mean_ if transformer.with_mean else 0.
+        scale = transformer.scale_ if transformer.with_std else 1.
+        return lambda batch: (np.column_stack(
+            [_column(batch, name).astype(float) for name in columns])
+            - mean) / scale
+
+    if isinstance(transformer, OrdinalEncoder):
+        if transformer.handle_unknown == 'use_encoded_value':
+            unknown_value = transformer.unknown_value
+        else:
+            unknown_value = None
+        lookups = [_Lookup(categories)
+                   for categories in transformer.categories_]
+
+        def transform(batch):
+            encoded = np.empty((len(_column(batch, columns[0])),
+                                len(columns)))
+            for j, (name, lookup) in enumerate(zip(columns, lookups)):
+                codes = lookup.codes(_column(batch, name))
+                if unknown_value is None and (codes < 0).any():
+                    raise ValueError('Found unknown categories in column %r'
+                                     % name)
+                encoded[:, j] = np.where(codes < 0, unknown_value, codes)
+            return encoded
+        return transform
+
+    if isinstance(transformer, OneHotEncoder):
+        if (transformer.drop_idx_ is not None
+                or transformer._infrequent_enabled):
+            raise ValueError('Cannot compile a OneHotEncoder with dropped or '
+                             'infrequent categories')
+        lookups = [_Lookup(categories)
+                   for categories in transformer.categories_]
+        offsets = np.cumsum([0] + [len(categories) for categories
+                                   in transformer.categories_])
+
+        def transform(batch):
+            n_samples = len(_column(batch, columns[0]))
+            encoded = np.zeros((n_samples, offsets[-1]))
+            rows = np.arange(n_samples)
+            for j, (name, lookup) in enumerate(zip(columns, lookups)):
+                codes = lookup.codes(_column(batch, name))
+                if transformer.handle_unknown == 'error' and (
+                        codes < 0).any():
+                    raise ValueError('Found unknown categories in column %r'
+                                     % name)
+                known = codes >= 0
+                encoded[rows[known], offsets[j] + codes[known]] = 1
+            return encoded
+        return transform
+    raise ValueError('Cannot compile a %s' % type(transformer).__name__)
+
+
+class CompiledPipeline:
+    """A fitted pipeline, with its ColumnTransformer as NumPy lookup tables.
+
+    Supports the ColumnTransformers of OrdinalEncoder, OneHotEncoder
+    (without dropped or infrequent categories), StandardScaler and
+    passthrough columns of the notebooks, possibly wrapped in a
+    tuning.CachedTransformer.
+
+    Parameters
+    ----------
+    model : fitted Pipeline
+        The pipeline, starting with a ColumnTransformer.
+    """
+
+    def __init__(self, model):
+        preprocessor = model[0]
+        # A tuning.CachedTransformer holds the fitted ColumnTransformer
+        preprocessor = getattr(preprocessor, 'transformer_', preprocessor)
+        if not isinstance(preprocessor, ColumnTransformer):
+            raise ValueError('The pipeline must start with a '
+                             'ColumnTransformer, got a %s'
+                             % type(preprocessor).__name__)
+        self.transforms = list()
+        for _, transformer, columns in preprocessor.transformers_:
+            if transformer == 'drop' or len(columns) == 0:
+                continue
+            columns = [preprocessor.feature_names_in_[column]
+                       if isinstance(column, (int, np.integer)) else column
+                       for column in columns]
+            self.transforms.append(
+                _compile_transformer(transformer, columns))
+        self.steps = model[1:]
+
+    def transform(self, batch):
+        "The input of the final estimator of the pipeline"
+        X = np.hstack([transform(batch) for transform in self.transforms])
+        for step in self.steps[:-1]:
+            X = step.transform(X)
+        return X
+
+    def predict(self, batch):
+        return self.steps[-1].predict(self.transform(batch))
+
+    def predict_proba(self, batch):
+        return self.steps[-1].predict_proba(self.transform(batch))
+
+
+class BatchPredictor:
+    """Predictions of a fitted pipeline on a stream of records, by batches.
+
+    Parameters
+    ----------
+    model : fitted estimator
+        The model, for instance a pipeline.
+    batch_size : int
+        The number of records predicted at once.
+    compiled : bool
+        Whether to use a CompiledPipeline rather than the pipeline itself.
+    method : str
+        The prediction method, 'predict' or 'predict_proba'.
+
+    Attributes
+    ----------
+    latencies_ : list of float
+        The time taken by the prediction of each batch, in seconds.
+    """
+
+    def __init__(self, model, batch_size=BATCH_SIZE, compiled=False,
+                 method='predict'):
+        self.model = model
+        self.batch_size = batch_size
+        self.compiled = compiled
+        self.method = method
+        self.latencies_ = list()
+        predictor = CompiledPipeline(model) if compiled else model
+        self._predict = getattr(predictor, method)
+
+    def predict(self, records):
+        """Predict a stream of records.
+
+        Parameters
+        ----------
+        records : iterable of dict or DataFrame
+            The records, as row dicts or DataFrame chunks.
+
+        Yields
+        ------
+        predictions : ndarray
+            The predictions of each batch of records.
+        """
+        for batch in iter_batches(records, self.batch_size):
+            start = time.perf_counter()
+            if not self.compiled and isinstance(batch, dict):
+                batch = pd.DataFrame(batch)
+            predictions = self._predict(batch)
+            self.latencies_.append(time.perf_counter() - start)
+            yield predictions
+
+    def latency_percentiles(self, percentiles=(50, 90, 99)):
+        "Percentiles of the latencies of the batches so far, in milliseconds"
+        latencies = np.array(self.latencies_) * 1000
+        if len(latencies) == 0:
+            return {percentile: np.nan for percentile in percentiles}
+        return dict(zip(percentiles, np.percentile(latencies, percentiles)))
@@ -0,0 +1,174 @@
+"""
+One-hot encoding of large categorical tables, as a sparse matrix.
+
+OneHotEncoder(sparse=False), as used in the notebooks, builds a dense matrix
+with a column per category: with millions of rows and thousands of
+categories, it does not fit in memory. SparseOneHotEncoder rather builds the
+CSR matrix directly, from the codes of the categories:
+
+* the categories of a column are found in a single pass, with pd.factorize,
+  or for free for the columns with a categorical dtype, such as the ones
+  of datasets.load_adult_census(categorical=True);
+* each row of the matrix has one non-zero value per column, so the indices
+  of the matrix are these codes, shifted by the first output column of each
+  input column.
+
+The columns with too many categories can be capped, either by keeping the
+most frequent categories and grouping the others in an "infrequent" column,
+or by hashing the categories into a fixed number of columns (the hashing
+trick, which also encodes the categories unknown at fit time)::
+
+    from sparse_encoding import SparseOneHotEncoder
+
+    encoder = SparseOneHotEncoder(max_categories=20)
+    data_encoded = encoder.fit_transform(data_categorical)
+"""
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.base import BaseEstimator, TransformerMixin
+
+HIGH_CARDINALITY = ('frequency', 'hashing')
+
+
+def _factorize(column):
+    "Codes of the values of a column, and its categories, in a single pass"
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.cat.codes.to_numpy(), column.cat.categories
+    return pd.factorize(column)
+
+
+def _hash(categories, n_columns):
+    "Output column of each category, with a hash independent of the process"
+    hashes = pd.util.hash_array(np.asarray(categories, dtype=object))
+    return (hashes % np.uint64(n_columns)).astype(np.intp)
+
+
+class SparseOneHotEncoder(TransformerMixin, BaseEstimator):
+    """Encode categorical columns as a sparse one-hot matrix.
+
+    The output columns of each variable are its sorted categories, as with
+    OneHotEncoder. Missing values are encoded as zeros in all the columns
+    of their variable, as are the categories unknown at fit time, unless
+    they go to an infrequent or hashed column.
+
+    Parameters
+    ----------
+    max_categories : int or None
+        The maximum number of output columns per input column. The columns
+        with more categories are encoded as given by high_cardinality.
+        None to keep all the categories.
+    high_cardinality : 'frequency' or 'hashing'
+        How to encode the columns with more than max_categories categories:
+        'frequency' keeps a column for each of the max_categories - 1 most
+        frequent categories, and gathers the other categories, and the
+        unknown ones, in a last column; 'hashing' maps the categories to
+        max_categories columns with a hash function.
+    dtype : dtype
+        The dtype of the output matrix.
+
+    Attributes
+    ----------
+    categories_ : list of Index or None
+        The categories of each column with their own output column, None
+        for hashed columns.
+    infrequent_ : list of bool
+        Whether the last output column of each column is the infrequent one.
+    n_outputs_ : ndarray of shape (n_features_in_,)
+        The number of output columns of each column.
+    """
+
+    def __init__(self, max_categories=None, high_cardinality='frequency',
+                 dtype=np.float64):
+        self.max_categories = max_categories
+        self.high_cardinality = high_cardinality
+        self.dtype = dtype
+
+    def fit(self, X, y=None):
+        if self.high_cardinality not in HIGH_CARDINALITY:
+            raise ValueError('high_cardinality must be one of %s, got %r'
+                             % (', '.join(HIGH_CARDINALITY),
+                                self.high_cardinality))
+        if self.max_categories is not None and self.max_categories < 2:
+            raise ValueError('max_categories must be at least 2, got %r'
+                             % self.max_categories)
+        X = pd.DataFrame(X)
+        self.feature_names_in_ = np.asarray(X.columns, dtype=object)
+        self.n_features_in_ = X.shape[1]
+        self.categories_, self.infrequent_ = list(), list()
+        n_outputs = list()
+        for _, column in X.items():
+            codes, categories = _factorize(column)
+            counts = np.bincount(codes[codes >= 0],
+                                 minlength=len(categories))
+            seen = np.flatnonzero(counts)
+            infrequent = False
+            if (self.max_categories is None
+                    or len(seen) <= self.max_categories):
+                kept = categories[seen]
+            elif self.high_cardinality == 'hashing':
+                kept = None
+            else:
+                # Stable sort: ties are broken by the order of the categories
+                top = seen[np.argsort(-counts[seen], kind='stable')]
+                kept = categories[top[:self.max_categories - 1]]
+                infrequent = True
+            if kept is not None:
+                # In the order of the columns of OneHotEncoder
+                kept = kept.sort_values()
+            self.categories_.append(kept)
+            self.infrequent_.append(infrequent)
+            n_outputs.append(self.max_categories if kept is None
+                             else len(kept) + infrequent)
+        self.n_outputs_ = np.array(n_outputs)
+        return self
+
+    def _output_columns(self, j, categories):
+        "Output column of each category of the j-th column, -1 if none"
+        if self.categories_[j] is None:
+            return _hash(categories, self.n_outputs_[j])
+        columns = self.categories_[j].get_indexer(categories)
+        if self.infrequent_[j]:
+            columns[columns < 0] = self.n_outputs_[j] - 1
+        return columns
+
+    def transform(self, X):
+        X = pd.DataFrame(X)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError('X has %d columns, but the encoder was fitted '
+                             'on %d columns'
+                             % (X.shape[1], self.n_features_in_))
+        offsets = np.concatenate([[0], np.cumsum(self.n_outputs_)])
+        indices = np.empty((len(X), X.shape[1]), dtype=np.int64)
+        for j, (_, column) in enumerate(X.items()):
+            codes, categories = _factorize(column)
+            # One lookup per category, not per row
+            columns = np.append(self._output_columns(j, categories), -1)
+            indices[:, j] = columns[codes]
+            valid = indices[:, j] >= 0
+            indices[valid, j] += offsets[j]
+        valid = indices >= 0
+        indptr = np.concatenate([[0], np.cumsum(valid.sum(axis=1))])
+        indices = indices[valid]
+        if offsets[-1] <= np.iinfo(np.int32).max:
+            indices = indices.astype(np.int32)
+            indptr = indptr.astype(np.int32)
+        return sparse.csr_matrix(
+            (np.ones(len(indices), dtype=self.dtype), indices, indptr),
+            shape=(len(X), offsets[-1]))
+
+    def get_feature_names_out(self, input_features=None):
+        "Names of the output columns, as '<column>_<category>'"
+        if input_features is None:
+            input_features = self.feature_names_in_
+        names = list()
+        for j, feature in enumerate(input_features):
+            if self.categories_[j] is None:
+                names.extend('%s_hash%d' % (feature, i)
+                             for i in range(self.n_outputs_[j]))
+                continue
+            names.extend('%s_%s' % (feature, category)
+                         for category in self.categories_[j])
+            if self.infrequent_[j]:
+                names.append('%s_infrequent' % feature)
+        return np.asarray(names, dtype=object)
@@ -0,0 +1,25 @@
+"""
+Benchmarks of the recurring kernels of the workshop.
+
+The benchmarks follow the conventions of asv (airspeed velocity): each
+class has ``params`` (the sizes of the data), a ``setup`` building the data
+for given parameters, and ``time_*`` methods timing a kernel. They are run
+by ../run_benchmarks.py, which also records the peak memory of each of them
+and compares them to the previous commits.
+
+The data are synthetic, drawn with fixed seeds in the shape of the datasets
+of the notebooks, so that the benchmarks do not depend on the data files.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The directories of the modules benchmarked, as the notebooks and scripts
+# using them add them to sys.path
+for directory in [ROOT,
+                  os.path.join(ROOT, 'Day_1_Scientific_Python', 'numpys'),
+                  os.path.join(ROOT, 'Day_1_Scientific_Python', 'pandas'),
+                  os.path.join(ROOT, 'figures')]:
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
@@ -0,0 +1,51 @@
+"""
+Benchmarks of the NumPy exercises: k-means and the inflammation dataset.
+"""
+import numpy as np
+
+import kmeans
+
+
+class KMeansDistances:
+    "Assignment of the points to their closest centroid, as in k_means.ipynb"
+    params = [[1000, 100000, 1000000]]
+    param_names = ['n_points']
+
+    def setup(self, n_points):
+        rng = np.random.RandomState(0)
+        self.data = rng.randn(n_points, 2)
+        self.centroids = rng.randn(3, 2)
+
+    def time_broadcast(self, n_points):
+        # As in the notebook: an array of shape (n_points, K, n_dims)
+        deltas = self.data[:, np.newaxis, :] - self.centroids
+        distances = np.sqrt(np.sum((deltas) ** 2, 2))
+        distances.argmin(1)
+
+    def time_assign(self, n_points):
+        kmeans.assign(self.data, self.centroids)
+
+    def time_update_centroids(self, n_points):
+        closest, _ = kmeans.assign(self.data, self.centroids)
+        kmeans.update_centroids(self.data, closest, self.centroids)
+
+
+class InflammationMean:
+    "Statistics per day of the inflammation-01 table, of 40 days"
+    params = [[60, 6000, 600000]]
+    param_names = ['n_patients']
+
+    def setup(self, n_patients):
+        rng = np.random.RandomState(0)
+        self.data = rng.randint(0, 20, size=(n_patients, 40)).astype(float)
+
+    def time_mean_per_day(self, n_patients):
+        np.mean(self.data, 0)
+
+    def time_mean_per_patient(self, n_patients):
+        np.mean(self.data, 1)
+
+    def time_stats_per_day(self, n_patients):
+        np.max(self.data, 0)
+        np.min(self.data, 0)
+        np.std(self.data, 0)
@@ -0,0 +1,126 @@
+"""
+Benchmarks of the pandas exercises: resampling the flow time series and
+grouping the movie tables.
+"""
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import flowdata
+import movies
+
+FLOW_COLUMNS = ['L06_347', 'LS06_347', 'LS06_348']
+
+
+def flow_frame(n_rows):
+    "Hourly flows in the shape of vmm_flowdata.csv"
+    rng = np.random.RandomState(0)
+    index = pd.date_range('2009-01-01', periods=n_rows, freq='h',
+                          name='Time')
+    return pd.DataFrame(rng.lognormal(size=(n_rows, len(FLOW_COLUMNS))),
+                        index=index, columns=FLOW_COLUMNS)
+
+
+def cast_frame(n_rows):
+    "A cast table as read from cast.csv, about 20 roles per title"
+    rng = np.random.RandomState(0)
+    n_titles = max(n_rows // 20, 1)
+    n_names = max(n_rows // 5, 1)
+    title_codes = rng.randint(n_titles, size=n_rows)
+    # The year, type and rank of the roles of a title
+    title_years = rng.randint(1900, 2020, size=n_titles)
+    n = rng.randint(1, 30, size=n_rows).astype(float)
+    n[rng.rand(n_rows) < .3] = np.nan
+    return pd.DataFrame({
+        'title': np.array(['Title %d' % i for i in range(n_titles)],
+                          dtype=object)[title_codes],
+        'year': title_years[title_codes],
+        'name': np.array(['Name %d' % i for i in range(n_names)],
+                         dtype=object)[rng.randint(n_names, size=n_rows)],
+        'type': np.array(['actor', 'actress'],
+                         dtype=object)[rng.randint(2, size=n_rows)],
+        'character': np.array(['Character %d' % i for i in range(1000)],
+                              dtype=object)[rng.zipf(1.5, size=n_rows)
+                                            % 1000],
+        'n': n})
+
+
+class Resample:
+    "Resampling of the flows, as in the time series exercises"
+    params = [[10000, 100000, 1000000]]
+    param_names = ['n_rows']
+
+    def setup(self, n_rows):
+        self.data = flow_frame(n_rows)
+
+    def time_resample_mean(self, n_rows):
+        self.data.resample('D').mean()
+
+    def time_resample_agg(self, n_rows):
+        # 'MS' rather than 'M', removed in pandas 3
+        self.data['L06_347'].resample('MS').agg(['mean', 'median'])
+
+    def time_daily_min_max(self, n_rows):
+        daily = self.data['LS06_348'].resample('D').mean()
+        daily.resample('MS').agg(['min', 'max'])
+
+
+class FlowdataResample:
+    "The single pass resample_agg of flowdata.py, on its cache"
+    params = [[10000, 300000]]
+    param_names = ['n_rows']
+
+    def setup(self, n_rows):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'flowdata.csv')
+        flow_frame(n_rows).to_csv(self.path)
+        flowdata.build_cache(self.path)
+
+    def teardown(self, n_rows):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def time_resample_agg(self, n_rows):
+        flowdata.resample_agg('MS', 'L06_347', path=self.path)
+
+    def time_load(self, n_rows):
+        flowdata.load(columns=['L06_347'], path=self.path)
+
+
+class MovieGroupBy:
+    """Group-bys of the cast table of the movie exercises, with pandas on
+    string columns, and with movies.py on categorical columns."""
+    params = [[100000, 1000000]]
+    param_names = ['n_rows']
+
+    def setup(self, n_rows):
+        self.cast = cast_frame(n_rows)
+        self.encoded = self.cast.astype({
+            column: 'category'
+            for column in ['title', 'name', 'type', 'character']})
+
+    def time_size_year_type(self, n_rows):
+        self.cast.groupby(['year', 'type']).size()
+
+    def time_size_name_nlargest(self, n_rows):
+        self.cast.groupby('name').size().nlargest(10)
+
+    def time_transform_title_max(self, n_rows):
+        self.cast.groupby('title')['n'].transform('max')
+
+    def time_size_decade(self, n_rows):
+        self.cast.groupby(self.cast['year'] // 10 * 10).size()
+
+    def time_encoded_size_year_type(self, n_rows):
+        movies.group_size(self.encoded, ['year', 'type'])
+
+    def time_encoded_size_name_nlargest(self, n_rows):
+        movies.group_size(self.encoded, 'name').nlargest(10)
+
+    def time_encoded_transform_title_max(self, n_rows):
+        movies.group_transform(self.encoded, 'title', 'n', 'max')
+
+    def time_encoded_value_counts(self, n_rows):
+        movies.value_counts(self.encoded['name'])
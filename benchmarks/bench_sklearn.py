@@ -0,0 +1,85 @@
+"""
+Benchmarks of the scikit-learn pipelines of the figures and notebooks.
+"""
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.compose import ColumnTransformer
+from sklearn.linear_model import LinearRegression
+from sklearn.model_selection import ShuffleSplit, validation_curve
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import (OneHotEncoder, OrdinalEncoder,
+                                   PolynomialFeatures, StandardScaler)
+
+import polynomial_curves
+
+# The categorical columns of the adult census and their number of
+# categories
+CENSUS_CATEGORIES = {
+    'workclass': 9, 'education': 16, 'marital-status': 7, 'occupation': 15,
+    'relationship': 6, 'race': 5, 'native-country': 42, 'sex': 2}
+CENSUS_NUMERICAL = ['age', 'education-num', 'hours-per-week',
+                    'capital-gain', 'capital-loss']
+
+
+def census_frame(n_rows):
+    "Data in the shape of the adult census, without the target"
+    rng = np.random.RandomState(0)
+    data = dict()
+    for column in CENSUS_NUMERICAL:
+        data[column] = rng.randint(0, 100, size=n_rows)
+    for column, n_categories in CENSUS_CATEGORIES.items():
+        # Unbalanced categories, as in the census
+        probabilities = 1 / np.arange(1, n_categories + 1)
+        data[column] = pd.Categorical.from_codes(
+            rng.choice(n_categories, size=n_rows,
+                       p=probabilities / probabilities.sum()),
+            [' %s-%d' % (column, i) for i in range(n_categories)])
+    return pd.DataFrame(data)
+
+
+class ValidationCurve:
+    """Validation curve of the polynomial regressions of
+    plot_overfit_underfit.py, and its reference with scikit-learn."""
+    params = [[75, 750, 7500]]
+    param_names = ['n_samples']
+
+    def setup(self, n_samples):
+        rng = np.random.RandomState(0)
+        self.x = 2 * rng.rand(n_samples) - 1
+        self.y = (1.2 * self.x ** 2 + .1 * self.x ** 3 - .4 * self.x ** 5
+                  - .5 * self.x ** 9 + .4 * rng.normal(size=n_samples))
+        self.degrees = np.arange(1, 15)
+        self.cv = ShuffleSplit(n_splits=20, test_size=.5, random_state=1)
+
+    def time_polynomial_curves(self, n_samples):
+        polynomial_curves.validation_curve(self.x, self.y, self.degrees,
+                                           cv=self.cv)
+
+    def time_sklearn(self, n_samples):
+        validation_curve(
+            make_pipeline(PolynomialFeatures(), LinearRegression()),
+            self.x.reshape(-1, 1), self.y,
+            param_name='polynomialfeatures__degree',
+            param_range=self.degrees, cv=self.cv)
+
+
+class CensusColumnTransformer:
+    "The preprocessing of 03_basic_preprocessing_categorical_variables"
+    params = [[10000, 50000, 200000]]
+    param_names = ['n_rows']
+
+    def setup(self, n_rows):
+        self.data = census_frame(n_rows)
+        self.preprocessor = ColumnTransformer([
+            ('binary-encoder', OrdinalEncoder(), ['sex']),
+            ('one-hot-encoder', OneHotEncoder(handle_unknown='ignore'),
+             [column for column in CENSUS_CATEGORIES if column != 'sex']),
+            ('standard-scaler', StandardScaler(), CENSUS_NUMERICAL)])
+        self.fitted = clone(self.preprocessor).fit(self.data)
+
+    def time_fit(self, n_rows):
+        self.preprocessor.fit(self.data)
+
+    def time_transform(self, n_rows):
+        self.fitted.transform(self.data)
@@ -1,61 +1,221 @@
-from __future__ import print_function
-from distutils.version import LooseVersion as Version
+"""
+Check that the packages required by the workshop are installed.
+
+By default, the versions of the packages are read from the metadata of the
+installed distributions, without importing them: the check is almost
+immediate. With --deep, each package is also imported, in its own process,
+the processes running in parallel, and the time of each import is
+reported. With --json, the report is printed as JSON, for scripts::
+
+    python check_env.py
+    python check_env.py --deep
+    python check_env.py --deep --json > report.json
+
+The exit status is 1 if a package is missing, too old, or fails to import.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from importlib import metadata
+except ImportError:
+    # Python < 3.8: the versions are read from the imported modules
+    metadata = None
 
 OK = '\x1b[42m[ OK ]\x1b[0m'
 FAIL = "\x1b[41m[FAIL]\x1b[0m"
 
-try:
-    import importlib
-except ImportError:
-    print(FAIL, "Python version 3.6 or above is required,"
-                " but %s is installed." % sys.version)
+MIN_PYTHON = (3, 6)
+# (module, distribution, minimum version)
+REQUIREMENTS = [('numpy', 'numpy', '1.16'),
+                ('scipy', 'scipy', '1.2'),
+                ('matplotlib', 'matplotlib', '3.0'),
+                ('IPython', 'ipython', '3.0'),
+                ('sklearn', 'scikit-learn', '0.21'),
+                ('pandas', 'pandas', '0.24'),
+                ('PIL', 'pillow', '1.1.7'),
+                ('notebook', 'notebook', '5.7'),
+                ('plotly', 'plotly', '4.3'),
+                ('pandas_profiling', 'pandas-profiling', '2.3')]
+IMPORT_TIMEOUT = 120
 
+# Run in a fresh interpreter by --deep, with the module as argument
+IMPORT_SCRIPT = """
+import importlib, json, sys, time
+start = time.perf_counter()
+module = importlib.import_module(sys.argv[1])
+import_time = time.perf_counter() - start
+print(json.dumps({'import_time': import_time,
+                  'version': str(getattr(module, '__version__', ''))}))
+"""
 
-def import_version(pkg, min_ver, fail_msg=""):
-    mod = None
+
+def parse_version(version):
+    """The release numbers of a version, such as (1, 2, 3) for '1.2.3rc1'.
+
+    The pre- and post-release suffixes are ignored: a release candidate
+    satisfies the requirement of its release.
+    """
+    match = re.match(r'\d+(\.\d+)*', str(version).strip())
+    if match is None:
+        return ()
+    return tuple(int(part) for part in match.group().split('.'))
+
+
+def installed_version(distribution):
+    "The version of an installed distribution, None if it is not installed"
     try:
-        mod = importlib.import_module(pkg)
-        if pkg in {'PIL'}:
-            try:
-                ver = mod.VERSION
-            except AttributeError:
-                try:
-                    ver = mod.PILLOW_VERSION
-                except:
-                    raise
-        else:
-            ver = mod.__version__
-        if Version(ver) < min_ver:
+        return metadata.version(distribution)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def import_module(module, timeout=IMPORT_TIMEOUT):
+    """Import a module in a new interpreter.
+
+    Returns
+    -------
+    result : dict
+        The 'version' of the module, its 'import_time' and the 'wall_time'
+        of the process (with the start of the interpreter), in seconds, or
+        the 'error' of the import.
+    """
+    start = time.perf_counter()
+    try:
+        process = subprocess.run(
+            [sys.executable, '-c', IMPORT_SCRIPT, module],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            universal_newlines=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {'error': 'import timed out after %ds' % timeout}
+    wall_time = time.perf_counter() - start
+    if process.returncode != 0:
+        # The last line of the traceback
+        lines = process.stderr.strip().splitlines() or [
+            'exit status %d' % process.returncode]
+        return {'error': lines[-1], 'wall_time': wall_time}
+    # The last line: the import may print on stdout
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    result['wall_time'] = wall_time
+    return result
+
+
+def check(requirements=REQUIREMENTS, deep=False, n_jobs=None):
+    """Check the version of Python, and of the required packages.
+
+    Parameters
+    ----------
+    requirements : list of (str, str, str)
+        The module, the distribution and the minimum version of each
+        package.
+    deep : bool
+        Whether to import the packages, in parallel processes.
+    n_jobs : int or None
+        The number of packages imported at once, one per CPU by default.
+
+    Returns
+    -------
+    report : dict
+        The 'python' interpreter, the 'packages' (their name, installed
+        and required version, whether they are 'ok', and for a deep check
+        their import time) and whether all of them are 'ok'.
+    """
+    start = time.perf_counter()
+    python = {'version': '.'.join(map(str, sys.version_info[:3])),
+              'executable': sys.executable, 'prefix': sys.prefix,
+              'required': '.'.join(map(str, MIN_PYTHON)),
+              'ok': sys.version_info[:2] >= MIN_PYTHON}
+    packages = []
+    for module, distribution, required in requirements:
+        package = {'name': module, 'distribution': distribution,
+                   'required': required, 'version': None, 'error': None}
+        if metadata is not None:
+            package['version'] = installed_version(distribution)
+            if package['version'] is None:
+                package['error'] = 'not installed'
+        packages.append(package)
+
+    if deep or metadata is None:
+        # Only the installed packages, unless their version is unknown
+        to_import = [package for package in packages
+                     if metadata is None or package['version'] is not None]
+        n_jobs = n_jobs or os.cpu_count() or 1
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            results = executor.map(import_module, [package['name']
+                                                   for package in to_import])
+            for package, result in zip(to_import, results):
+                if package['version'] is None:
+                    package['version'] = result.get('version') or None
+                package['error'] = result.get('error')
+                if deep:
+                    package['import_time'] = result.get('import_time')
+                    package['wall_time'] = result.get('wall_time')
+
+    for package in packages:
+        if package['error'] is None and package['version'] is None:
+            package['error'] = 'unknown version'
+        if package['error'] is None and (parse_version(package['version'])
+                                         < parse_version(package['required'])):
+            package['error'] = 'version %s or higher required' % (
+                package['required'])
+        package['ok'] = package['error'] is None
+    return {'python': python, 'packages': packages, 'deep': deep,
+            'ok': python['ok'] and all(package['ok'] for package in packages),
+            'time': time.perf_counter() - start}
+
+
+def print_report(report):
+    python = report['python']
+    print('Using python in', python['prefix'])
+    print(sys.version)
+    if not python['ok']:
+        print(FAIL, "Python version %s or above is required,"
+                    " but %s is installed." % (python['required'],
+                                               python['version']))
+    print()
+    for package in report['packages']:
+        timing = ''
+        if package.get('import_time') is not None:
+            timing = ' (imported in %.2fs, %.2fs with the interpreter)' % (
+                package['import_time'], package['wall_time'])
+        if package['ok']:
+            print(OK, '%s version %s%s' % (package['name'],
+                                           package['version'], timing))
+        elif package['error'] == 'not installed':
+            print(FAIL, '%s not installed.' % package['name'])
+        elif package['version'] is not None and package['error'].startswith(
+                'version'):
             print(FAIL, "%s version %s or higher required, but %s installed."
-                  % (lib, min_ver, ver))
+                  % (package['name'], package['required'],
+                     package['version']))
         else:
-            print(OK, '%s version %s' % (pkg, ver))
-    except ImportError:
-        print(FAIL, '%s not installed. %s' % (pkg, fail_msg))
-    return mod
-
-
-# first check the python version
-print('Using python in', sys.prefix)
-print(sys.version)
-pyversion = Version(sys.version)
-if pyversion >= "3":
-    if pyversion < "3.6":
-        print(FAIL, "Python version 3.6 or above is required,"
-                    " but %s is installed." % sys.version)
-elif pyversion >= "2":
-    print(FAIL, "Python version 3.6 or above is required,"
-                " but %s is installed." % sys.version)
-else:
-    print(FAIL, "Unknown Python version: %s" % sys.version)
-
-print()
-requirements = {'numpy': "1.16", 'scipy': "1.2", 'matplotlib': "3.0",
-                'IPython': "3.0", 'sklearn': "0.21", 'pandas': "0.24",
-                'PIL': "1.1.7", 'notebook': "5.7", 'plotly': "4.3",
-                'pandas_profiling': "2.3"}
-
-# now the dependencies
-for lib, required_version in list(requirements.items()):
-    import_version(lib, required_version)
+            print(FAIL, '%s: %s' % (package['name'], package['error']))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--deep', action='store_true',
+                        help='also import the packages, in parallel '
+                             'processes, and time the imports')
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                        help='number of packages imported at once with '
+                             '--deep (default: one per CPU)')
+    parser.add_argument('--json', action='store_true',
+                        help='print the report as JSON')
+    args = parser.parse_args(argv)
+    report = check(deep=args.deep, n_jobs=args.jobs)
+    if args.json:
+        print(json.dumps(report, indent=1))
+    else:
+        print_report(report)
+    return 0 if report['ok'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,6 @@
+"""
+Datasets of the workshop.
+"""
+from .adult_census import fetch_adult_census_csv, load_adult_census
+
+__all__ = ['fetch_adult_census_csv', 'load_adult_census']
@@ -0,0 +1,98 @@
+"""
+Local, cached access to the adult census dataset of the Day 2 notebooks.
+
+The CSV file is looked up in the data home (this directory, or
+$WORKSHOP_DATA_HOME), and downloaded from OpenML only if it is not there.
+It is then parsed once, with categorical dtypes for the categorical columns,
+and stored in a binary cache next to it (Feather if pyarrow is installed,
+pickle otherwise), from which the following loads are almost immediate.
+The categorical columns hold strings, as with pd.read_csv, unless
+categorical=True keeps their categorical dtype, which is lighter and faster
+to group or encode.
+
+On a machine without internet access, copy adult-census.csv to the data home
+beforehand.
+"""
+import os
+import shutil
+from urllib.request import urlopen
+
+import pandas as pd
+
+URL = "https://www.openml.org/data/get_csv/1595261/adult-census.csv"
+DATA_HOME = os.environ.get('WORKSHOP_DATA_HOME',
+                           os.path.dirname(os.path.abspath(__file__)))
+
+CATEGORICAL_COLUMNS = [
+    'workclass', 'education', 'marital-status', 'occupation',
+    'relationship', 'race', 'native-country', 'sex']
+
+try:
+    import pyarrow  # noqa: F401
+    CACHE_FORMAT = 'feather'
+except ImportError:
+    CACHE_FORMAT = 'pickle'
+
+
+def fetch_adult_census_csv(data_home=None):
+    """Path of the adult census CSV file, downloaded if not yet available.
+
+    Parameters
+    ----------
+    data_home : str, optional
+        The directory holding the data, DATA_HOME by default.
+
+    Returns
+    -------
+    path : str
+        The path of adult-census.csv.
+    """
+    data_home = DATA_HOME if data_home is None else data_home
+    path = os.path.join(data_home, 'adult-census.csv')
+    if os.path.exists(path):
+        return path
+    os.makedirs(data_home, exist_ok=True)
+    try:
+        with urlopen(URL) as response, open(path + '.part', 'wb') as f:
+            shutil.copyfileobj(response, f)
+    except OSError as e:
+        raise OSError(
+            "Could not download the adult census dataset from %s (%s). "
+            "Without internet access, copy adult-census.csv to %s."
+            % (URL, e, data_home)) from e
+    os.replace(path + '.part', path)
+    return path
+
+
+def load_adult_census(data_home=None, categorical=False):
+    """Load the adult census dataset, as a DataFrame.
+
+    Parameters
+    ----------
+    data_home : str, optional
+        The directory holding the data, DATA_HOME by default.
+    categorical : bool
+        Whether the categorical columns have a categorical dtype, or hold
+        strings as with pd.read_csv (the default).
+
+    Returns
+    -------
+    adult_census : DataFrame
+        The dataset, with its target in the "class" column.
+    """
+    csv_path = fetch_adult_census_csv(data_home)
+    cache_path = os.path.splitext(csv_path)[0] + '.' + CACHE_FORMAT
+    if (os.path.exists(cache_path)
+            and os.path.getmtime(cache_path) >= os.path.getmtime(csv_path)):
+        adult_census = getattr(pd, 'read_' + CACHE_FORMAT)(cache_path)
+    else:
+        adult_census = pd.read_csv(
+            csv_path,
+            dtype={column: 'category' for column in CATEGORICAL_COLUMNS})
+        getattr(adult_census, 'to_' + CACHE_FORMAT)(cache_path)
+
+    if not categorical:
+        for column in CATEGORICAL_COLUMNS:
+            adult_census[column] = adult_census[column].astype(
+                adult_census[column].cat.categories.dtype)
+    return adult_census
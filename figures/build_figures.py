@@ -0,0 +1,195 @@
+"""
+Build the figures of the slides, skipping the ones that are up to date.
+
+A figure script is split on its "# %%" markers: the code above the first
+marker is a preamble shared by all sections, and each section is run as an
+independent task on a pool of processes. The figures saved by a section are
+keyed on a hash of its inputs (the preamble, with the data-generating
+process, the section, with its seeds and degrees, and the local modules
+imported by the preamble, such as style_figs.py): a section is only run
+again when this hash changed or when one of its figures is missing.
+
+Usage::
+
+    python build_figures.py [--force] [--jobs N] [script.py ...]
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MANIFEST = os.path.join(HERE, '.build_figures.json')
+DEFAULT_SCRIPTS = ['plot_overfit_underfit.py']
+SECTION_MARKER = '# %%'
+
+
+def split_sections(source):
+    """Split the source of a script on its "# %%" markers.
+
+    Returns the preamble and the list of sections, each of them as a
+    ``(first_line, code)`` pair, ``first_line`` being used to keep the line
+    numbers of the script in tracebacks.
+    """
+    chunks = [(0, [])]
+    for lineno, line in enumerate(source.splitlines(True)):
+        if line.startswith(SECTION_MARKER):
+            chunks.append((lineno + 1, []))
+        else:
+            chunks[-1][1].append(line)
+    chunks = [(first_line, ''.join(lines)) for first_line, lines in chunks]
+    if len(chunks) == 1:
+        # No markers: the whole script is a single task
+        return (0, ''), chunks
+    return chunks[0], chunks[1:]
+
+
+def section_title(code):
+    "The first comment line of a section"
+    for line in code.splitlines():
+        if line.startswith('#'):
+            return line.lstrip('# ').strip()
+    return ''
+
+
+def local_modules(preamble):
+    "Sources of the modules of this directory imported by a preamble"
+    names = re.findall(r'^(?:from|import)\s+(\w+)', preamble, flags=re.M)
+    sources = []
+    for name in sorted(set(names)):
+        path = os.path.join(HERE, name + '.py')
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                sources.append(f.read())
+    return sources
+
+
+def section_key(script, preamble, code):
+    "Hash of everything that a section depends on"
+    digest = hashlib.sha256()
+    for part in ([script.encode(), preamble.encode(), code.encode()]
+                 + local_modules(preamble)):
+        digest.update(hashlib.sha256(part).digest())
+    return digest.hexdigest()
+
+
+def run_section(script_path, preamble, section):
+    """Run a section of a script after its preamble, in a worker process.
+
+    Returns the names of the files saved by the section.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib import pyplot as plt
+    from matplotlib.figure import Figure
+
+    script_dir = os.path.dirname(script_path)
+    os.chdir(script_dir)
+    if script_dir not in sys.path:
+        sys.path.insert(0, script_dir)
+
+    saved = []
+    savefig = Figure.savefig
+
+    def recording_savefig(self, fname, *args, **kwargs):
+        saved.append(os.fspath(fname))
+        return savefig(self, fname, *args, **kwargs)
+
+    Figure.savefig = recording_savefig
+    namespace = {'__name__': '__main__', '__file__': script_path}
+    try:
+        for first_line, code in (preamble, section):
+            code = compile('\n' * first_line + code, script_path, 'exec')
+            exec(code, namespace)
+    finally:
+        Figure.savefig = savefig
+        # Also frees the figures reused by style_figs.figure
+        plt.close('all')
+    return saved
+
+
+def load_manifest():
+    if not os.path.exists(MANIFEST):
+        return {}
+    with open(MANIFEST) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest):
+    with open(MANIFEST, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+
+
+def is_up_to_date(entry):
+    return entry is not None and all(
+        os.path.exists(os.path.join(HERE, name)) for name in entry)
+
+
+def build(scripts=DEFAULT_SCRIPTS, force=False, n_jobs=None):
+    """Build the figures of the given scripts, in parallel.
+
+    Returns the number of sections that failed.
+    """
+    manifest = load_manifest()
+    new_manifest = dict(manifest)
+    tasks = []
+    for script in scripts:
+        script_path = os.path.join(HERE, script)
+        with open(script_path) as f:
+            preamble, sections = split_sections(f.read())
+        previous = manifest.get(script, {})
+        new_manifest[script] = {}
+        for section in sections:
+            key = section_key(script, preamble[1], section[1])
+            title = '%s: %s' % (script, section_title(section[1]))
+            if not force and is_up_to_date(previous.get(key)):
+                print('[skip] %s' % title)
+                new_manifest[script][key] = previous[key]
+            else:
+                tasks.append((script, key, title, script_path, preamble,
+                              section))
+
+    n_failed = 0
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        futures = {
+            executor.submit(run_section, script_path, preamble, section):
+            (script, key, title)
+            for script, key, title, script_path, preamble, section in tasks}
+        for future in as_completed(futures):
+            script, key, title = futures[future]
+            try:
+                saved = future.result()
+            except Exception as e:
+                print('[FAIL] %s: %r' % (title, e))
+                n_failed += 1
+                continue
+            print('[done] %s: %s' % (title, ', '.join(saved)))
+            new_manifest[script][key] = saved
+            # Record progress as we go, for interrupted builds
+            save_manifest(new_manifest)
+    save_manifest(new_manifest)
+
+    # Evict the least recently used fits of the workers
+    import fit_cache
+    fit_cache.reduce_size()
+    return n_failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('scripts', nargs='*', default=DEFAULT_SCRIPTS,
+                        help='figure scripts to build (default: %(default)s)')
+    parser.add_argument('--force', action='store_true',
+                        help='rebuild figures even if they are up to date')
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                        help='number of worker processes (default: one per '
+                             'CPU)')
+    args = parser.parse_args(argv)
+    return 1 if build(args.scripts, args.force, args.jobs) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
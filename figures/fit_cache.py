@@ -0,0 +1,59 @@
+"""
+On-disk cache of fitted estimators, shared by the figure scripts.
+
+Fits are memoized with joblib.Memory: the cache is addressed by a hash of
+the estimator parameters and of the bytes of the training data, so that an
+identical fit is computed only once, whichever script or process asks for
+it. reduce_size evicts the least recently used fits beyond BYTES_LIMIT, as
+build_figures.py does at the end of a build.
+
+The cache lives at the root of the repository (or in $WORKSHOP_FIT_CACHE),
+so that the notebooks can share it::
+
+    import sys
+    sys.path.insert(0, '../figures')
+    from fit_cache import cached_fit
+
+    model = cached_fit(model, X_train, y_train)
+"""
+import os
+
+from joblib import Memory
+from sklearn.base import clone
+
+CACHE_DIR = os.environ.get(
+    'WORKSHOP_FIT_CACHE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir,
+                 '.fit_cache'))
+BYTES_LIMIT = '200M'
+
+memory = Memory(CACHE_DIR, verbose=0)
+
+
+@memory.cache
+def _fit(estimator, X, y):
+    return estimator.fit(X, y)
+
+
+def cached_fit(estimator, X, y):
+    """Fit a clone of estimator on (X, y), or load an identical previous fit.
+
+    Parameters
+    ----------
+    estimator : scikit-learn estimator
+        The estimator to fit. It is cloned, so only its parameters matter.
+    X : ndarray of shape (n_samples, n_features)
+        The training data.
+    y : ndarray of shape (n_samples,)
+        The training target.
+
+    Returns
+    -------
+    estimator : fitted clone of `estimator`
+    """
+    return _fit(clone(estimator), X, y)
+
+
+def reduce_size(bytes_limit=BYTES_LIMIT):
+    "Evict the least recently used fits until the cache fits in bytes_limit"
+    memory.reduce_size(bytes_limit=bytes_limit)
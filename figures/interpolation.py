@@ -0,0 +1,116 @@
+"""
+Interpolating splines of large, unsorted 1D data with duplicated x values.
+
+An interpolating spline needs strictly increasing x values: plot_splines.py
+sorted the data, and averaged the y values of each duplicated x with a loop
+comparing all the samples to each distinct value, which is quadratic in the
+number of samples. group_mean rather sorts the data once, with np.unique,
+and sums the y values of each distinct x with np.bincount::
+
+    import interpolation
+
+    x_unique, y_mean, counts = interpolation.group_mean(x, y)
+
+fit_spline does so before fitting the spline, and evaluate evaluates it on
+a dense grid chunk by chunk, to bound the memory used::
+
+    spline = interpolation.fit_spline(x, y, kind='quadratic')
+    y_grid = interpolation.evaluate(spline, np.linspace(-.08, .12, 10 ** 7))
+"""
+import numpy as np
+from scipy import interpolate
+
+CHUNK_SIZE = 65536
+# The degree of the spline of each kind, as for scipy.interpolate.interp1d
+DEGREES = {'linear': 1, 'quadratic': 2, 'cubic': 3}
+
+
+def group_mean(x, y):
+    """The mean of y for each distinct value of x.
+
+    Parameters
+    ----------
+    x : array-like of shape (n_samples,)
+        The values grouping the samples, in any order.
+    y : array-like of shape (n_samples,)
+        The values averaged.
+
+    Returns
+    -------
+    x_unique : ndarray of shape (n_unique,)
+        The distinct values of x, sorted.
+    y_mean : ndarray of shape (n_unique,)
+        The mean of y for each of them.
+    counts : ndarray of shape (n_unique,)
+        The number of samples of each of them.
+    """
+    x = np.ravel(x)
+    y = np.ravel(y)
+    if len(x) != len(y):
+        raise ValueError('x and y must have the same length, got %d and %d'
+                         % (len(x), len(y)))
+    x_unique, codes, counts = np.unique(x, return_inverse=True,
+                                        return_counts=True)
+    sums = np.bincount(codes.ravel(), weights=y, minlength=len(x_unique))
+    return x_unique, sums / counts, counts
+
+
+def fit_spline(x, y, kind='quadratic'):
+    """The spline interpolating the mean of y for each distinct value of x.
+
+    As interp1d(x, y, kind=kind, fill_value='extrapolate') on the sorted
+    distinct values of x, without the samples whose x or y is not finite.
+
+    Parameters
+    ----------
+    x : array-like of shape (n_samples,)
+        The abscissas, in any order, possibly duplicated.
+    y : array-like of shape (n_samples,)
+        The values.
+    kind : 'linear', 'quadratic', 'cubic' or int
+        The kind of spline, or its degree.
+
+    Returns
+    -------
+    spline : BSpline
+        The spline, extrapolated outside of the range of x.
+    """
+    degree = DEGREES.get(kind, kind)
+    if not isinstance(degree, (int, np.integer)):
+        raise ValueError('kind must be one of %s or a degree, got %r'
+                         % (', '.join(DEGREES), kind))
+    x = np.ravel(x).astype(float)
+    y = np.ravel(y).astype(float)
+    finite = np.isfinite(x) & np.isfinite(y)
+    if not finite.all():
+        x, y = x[finite], y[finite]
+    x_unique, y_mean, _ = group_mean(x, y)
+    if len(x_unique) <= degree:
+        raise ValueError('A spline of degree %d needs %d distinct x values, '
+                         'got %d' % (degree, degree + 1, len(x_unique)))
+    return interpolate.make_interp_spline(x_unique, y_mean, k=degree)
+
+
+def evaluate(spline, x, chunk_size=CHUNK_SIZE):
+    """Evaluate a spline on the points of x, chunk by chunk.
+
+    Parameters
+    ----------
+    spline : callable
+        The spline, for instance from fit_spline.
+    x : array-like of shape (n_points,)
+        The points, such as a dense grid.
+    chunk_size : int
+        The number of points evaluated at once.
+
+    Returns
+    -------
+    y : ndarray of shape (n_points,)
+        The values of the spline.
+    """
+    x = np.ravel(x)
+    y = np.empty(len(x))
+    for start in range(0, len(x), chunk_size):
+        chunk = slice(start, start + chunk_size)
+        y[chunk] = spline(x[chunk])
+    return y
@@ -15,7 +15,7 @@ iris = datasets.load_iris()
 X = iris.data
 y = iris.target
 for x, feature_name in zip(X.T, iris.feature_names):
-    plt.figure(figsize=(2.5, 2))
+    style_figs.figure(figsize=(2.5, 2))
     patches = list()
     for this_y, target_name in enumerate(iris.target_names):
         patch = plt.hist(x[y == this_y],
@@ -28,7 +28,7 @@ for x, feature_name in zip(X.T, iris.feature_names):
     feature_name = feature_name.replace(')', '')
     plt.savefig('iris_{}_hist.svg'.format(feature_name))
 
-plt.figure(figsize=(6, .25))
+style_figs.figure(figsize=(6, .25))
 plt.legend(patches, iris.target_names, ncol=3, loc=(0, -.37),
            borderaxespad=0)
 style_figs.no_axis()
@@ -1,28 +1,60 @@
 import numpy as np
 from matplotlib import pyplot as plt
 
+from sklearn import linear_model, model_selection, tree
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import PolynomialFeatures
+from sklearn.linear_model import LinearRegression
+from scipy import interpolate
+
 # Set up figures look and feel
 import style_figs
+# Identical fits are shared across sections and builds
+from fit_cache import cached_fit
+# Fast validation and learning curves of polynomial regressions
+import polynomial_curves
+
+# Everything above the first "# %%" marker is shared: each section below
+# only relies on it, so that build_figures.py can run them independently
 
-# %%
-# Our data-generating process
 
+# Our data-generating process
 def f(t):
     return 1.2 * t ** 2 + .1 * t ** 3 - .4 * t ** 5 - .5 * t ** 9
 
-N_SAMPLES = 50
 
-rng = np.random.RandomState(0)
-x = 2 * rng.rand(N_SAMPLES) - 1
+def generate_data(n_samples, n_test_samples=0, seed=0):
+    "Draw noisy train (and test) observations of f on [-1, 1]"
+    rng = np.random.RandomState(seed)
+    x = 2 * rng.rand(n_samples) - 1
+    y = f(x) + .4 * rng.normal(size=n_samples)
+    x_test = 2 * rng.rand(n_test_samples) - 1
+    y_test = f(x_test) + .4 * rng.normal(size=n_test_samples)
+    return x, y, x_test, y_test
 
-y = f(x) + .4 * rng.normal(size=N_SAMPLES)
 
-x_test = 2 * rng.rand(N_SAMPLES) - 1
+# Our model (polynomial regression)
+def polynomial_model(degree):
+    return make_pipeline(PolynomialFeatures(degree=degree), LinearRegression())
 
-y_test = f(x_test) + .4 * rng.normal(size=N_SAMPLES)
 
+def learning_curve_sizes(n_samples):
+    "Train sizes of the learning curves, ShuffleSplit training on 90%"
+    n_train = n_samples - int(np.ceil(.1 * n_samples))
+    return (np.logspace(-2.5, -.3, 30) * n_train).astype(int)
 
-plt.figure()
+
+N_SAMPLES = 50
+N_SAMPLES_CURVES = 150
+
+t = np.linspace(-1, 1, 100)
+
+# %%
+# Our data
+
+x, y, _, _ = generate_data(N_SAMPLES)
+
+style_figs.figure()
 plt.scatter(x, y, s=20, color='k')
 
 style_figs.no_axis()
@@ -31,24 +63,16 @@ plt.xlim(-1.1, 1.1)
 plt.ylim(-.74, 2.1)
 plt.savefig('polynomial_overfit_0.svg', facecolor='none', edgecolor='none')
 
-# %%
-# Our model (polynomial regression)
-
-from sklearn.pipeline import make_pipeline
-from sklearn.preprocessing import PolynomialFeatures
-from sklearn.linear_model import LinearRegression
-
 # %%
 # Fit model with various complexity in the polynomial degree
 
-plt.figure()
-plt.scatter(x, y, s=20, color='k')
+x, y, _, _ = generate_data(N_SAMPLES)
 
-t = np.linspace(-1, 1, 100)
+style_figs.figure()
+plt.scatter(x, y, s=20, color='k')
 
 for d in (1, 2, 5, 9):
-    model = make_pipeline(PolynomialFeatures(degree=d), LinearRegression())
-    model.fit(x.reshape(-1, 1), y)
+    model = cached_fit(polynomial_model(d), x.reshape(-1, 1), y)
     plt.plot(t, model.predict(t.reshape(-1, 1)), label='Degree %d' % d,
              linewidth=4)
 
@@ -72,7 +96,10 @@ plt.savefig('polynomial_overfit.svg', facecolor='none', edgecolor='none')
 # %%
 # A figure with the true model and the estimated one
 
-plt.figure(figsize=[.5 * 6.4, .5 * 4.9])
+x, y, _, _ = generate_data(N_SAMPLES)
+model = cached_fit(polynomial_model(9), x.reshape(-1, 1), y)
+
+style_figs.figure(figsize=[.5 * 6.4, .5 * 4.9])
 plt.scatter(x, y, s=20, color='k')
 plt.plot(t, model.predict(t.reshape(-1, 1)), color='C3',
          label='$\hat{f}$')
@@ -89,7 +116,10 @@ plt.savefig('polynomial_overfit_simple.svg', facecolor='none', edgecolor='none')
 # %%
 # A figure with the true model and the estimated one
 
-plt.figure(figsize=[.5 * 6.4, .5 * 4.9])
+x, y, _, _ = generate_data(N_SAMPLES)
+model = cached_fit(polynomial_model(9), x.reshape(-1, 1), y)
+
+style_figs.figure(figsize=[.5 * 6.4, .5 * 4.9])
 plt.scatter(x, y, s=20, color='k')
 plt.plot(t, model.predict(t.reshape(-1, 1)), color='C3',
          label='Fitted model')
@@ -108,10 +138,10 @@ plt.savefig('polynomial_overfit_simple_legend.svg', facecolor='none', edgecolor=
 # %%
 # Underfit settings
 
-model = make_pipeline(PolynomialFeatures(degree=1), LinearRegression())
-model.fit(x.reshape(-1, 1), y)
+x, y, _, _ = generate_data(N_SAMPLES)
+model = cached_fit(polynomial_model(1), x.reshape(-1, 1), y)
 
-plt.figure(figsize=[.5 * 6.4, .5 * 4.9])
+style_figs.figure(figsize=[.5 * 6.4, .5 * 4.9])
 plt.scatter(x, y, s=20, color='k')
 plt.plot(t, model.predict(t.reshape(-1, 1)), color='C0',
          label='Fitted model\n$\\approx$best possible fit')
@@ -128,15 +158,14 @@ plt.savefig('polynomial_overfit_assymptotic.svg', facecolor='none', edgecolor='n
 # %%
 # Train and test set with various complexity in the polynomial degree
 
-plt.figure()
+x, y, x_test, y_test = generate_data(N_SAMPLES, N_SAMPLES)
+
+style_figs.figure()
 plt.scatter(x, y, s=20, color='k')
 plt.scatter(x_test, y_test, s=20, color='C1')
 
-t = np.linspace(-1, 1, 100)
-
 for d in (1, 2, 5, 9):
-    model = make_pipeline(PolynomialFeatures(degree=d), LinearRegression())
-    model.fit(x.reshape(-1, 1), y)
+    model = cached_fit(polynomial_model(d), x.reshape(-1, 1), y)
     plt.plot(t, model.predict(t.reshape(-1, 1)), label='Degree %d' % d,
              linewidth=4)
 
@@ -151,29 +180,19 @@ for d in (1, 2, 5, 9):
 
 # %%
 # Validation curves
-from sklearn import model_selection
-
-N_SAMPLES = 150
-
-rng = np.random.RandomState(0)
-x = 2 * rng.rand(N_SAMPLES) - 1
-
-y = f(x) + .4 * rng.normal(size=N_SAMPLES)
 
+x, y, _, _ = generate_data(N_SAMPLES_CURVES)
 
 param_range = np.arange(1, 15)
 
-train_scores, test_scores = model_selection.validation_curve(
-    model, x[::2].reshape((-1, 1)), y[::2],
-    param_name='polynomialfeatures__degree',
-    param_range=param_range,
+train_scores, test_scores = polynomial_curves.validation_curve(
+    x[::2], y[::2], param_range,
     cv=model_selection.ShuffleSplit(n_splits=20, test_size=.5,
-                                    random_state=1),
-    scoring='r2')
+                                    random_state=1))
 
 plotted_degrees = [1, 2, 5, 9, 15]
 for i, degree in enumerate(plotted_degrees):
-    plt.figure(figsize=(4.5, 3))
+    style_figs.figure(figsize=(4.5, 3))
     if degree > 1:
         symbol_train = '--'
         symbol_test = ''
@@ -210,12 +229,7 @@ for i, degree in enumerate(plotted_degrees):
 
 # %%
 # Learning curves
-rng = np.random.RandomState(0)
-x = 2 * rng.rand(100 * N_SAMPLES) - 1
-
-y = f(x) + .4 * rng.normal(size=100 * N_SAMPLES)
-
-X = x.reshape((-1, 1))
+x, y, _, _ = generate_data(100 * N_SAMPLES_CURVES)
 
 np.random.seed(42)
 
@@ -236,10 +250,9 @@ def savefig(name):
 
 
 # Degree 9
-model = make_pipeline(PolynomialFeatures(degree=9), LinearRegression())
-train_sizes, train_scores, test_scores = model_selection.learning_curve(
-    model, X, y, cv=model_selection.ShuffleSplit(n_splits=20),
-    train_sizes=np.logspace(-2.5, -.3, 30))
+train_sizes, train_scores, test_scores = polynomial_curves.learning_curve(
+    x, y, 9, cv=model_selection.ShuffleSplit(n_splits=20),
+    train_sizes=learning_curve_sizes(len(x)))
 
 idx_to_plot = [0, 7, 19, 29]
 
@@ -251,7 +264,7 @@ for i in idx_to_plot:
     else:
         symbol_train = 'o'
         symbol_test = 'o'
-    plt.figure(figsize=(4.5, 3))
+    style_figs.figure(figsize=(4.5, 3))
     test_plot = plt.semilogx(train_sizes[:i+1],
                              -np.mean(test_scores, axis=1)[:i+1],
                              symbol_test,
@@ -265,17 +278,19 @@ for i in idx_to_plot:
 
 # %%
 # Training with varying sample size
-t = np.linspace(-1, 1, 100)
+x, y, _, _ = generate_data(100 * N_SAMPLES_CURVES)
+train_sizes = learning_curve_sizes(len(x))
+idx_to_plot = [0, 7, 19, 29]
 
 d = 9
-model = make_pipeline(PolynomialFeatures(degree=d), LinearRegression())
 for i in idx_to_plot:
-    plt.figure()
+    style_figs.figure()
     n_train = train_sizes[i]
     plt.scatter(x[::2], y[::2], marker='.', s=20, color='C1', alpha=.1)
     plt.scatter(x[:min(n_train, 3000)], y[:min(n_train, 3000)], s=20, color='k')
 
-    model.fit(x[:n_train].reshape(-1, 1), y[:n_train])
+    model = cached_fit(polynomial_model(d), x[:n_train].reshape(-1, 1),
+                       y[:n_train])
     plt.plot(t, model.predict(t.reshape(-1, 1)), label='Degree %d' % d,
              linewidth=4, color='C3')
 
@@ -291,26 +306,15 @@ for i in idx_to_plot:
 
 # %%
 # Various notions of model complexity
-N_SAMPLES = 50
-
-rng = np.random.RandomState(0)
-x = 2 * rng.rand(N_SAMPLES) - 1
-
-y = f(x) + .4 * rng.normal(size=N_SAMPLES)
-
-from sklearn import tree
+x, y, _, _ = generate_data(N_SAMPLES)
 
 for degree in (4, 16):
-    plt.figure(figsize=(.8*4, .8*3), facecolor='none')
-    plt.clf()
+    style_figs.figure(figsize=(.8*4, .8*3), facecolor='none')
     ax = plt.axes([.1, .1, .9, .9])
 
-    poly = make_pipeline(PolynomialFeatures(degree=degree),
-                                            LinearRegression())
+    poly = cached_fit(polynomial_model(degree), x.reshape((-1, 1)), y)
     decision_tree = tree.DecisionTreeRegressor(
         max_depth=int(np.log2(degree)))
-
-    poly.fit(x.reshape((-1, 1)), y)
     decision_tree.fit(x.reshape((-1, 1)), y)
 
     plt.scatter(x, y,  color='k', s=9, alpha=.8)
@@ -332,23 +336,14 @@ for degree in (4, 16):
 
 # %%
 # Simple figure to demo overfit: with our polynomial data
+# (the figures below share this figure and its y limits, hence a single
+# section)
 
-N_SAMPLES = 50
+x, y, x_test, y_test = generate_data(N_SAMPLES, 10 * N_SAMPLES)
 
-rng = np.random.RandomState(0)
-x = 2 * rng.rand(N_SAMPLES) - 1
-
-y = f(x) + .4 * rng.normal(size=N_SAMPLES)
-
-x_test = 2 * rng.rand(10*N_SAMPLES) - 1
-
-y_test = f(x_test) + .4 * rng.normal(size=10*N_SAMPLES)
-
-plt.figure(figsize=(.8*4, .8*3), facecolor='none')
-plt.clf()
+style_figs.figure(figsize=(.8*4, .8*3), facecolor='none')
 ax = plt.axes([.1, .1, .9, .9])
 
-from sklearn import linear_model
 # Create linear regression object
 regr = linear_model.LinearRegression()
 regr.fit(x.reshape((-1, 1)), y)
@@ -374,18 +369,16 @@ plt.ylim(ymin, ymax)
 plt.savefig('ols_simple_test.svg', facecolor='none', edgecolor='none')
 
 
-# %%
 # Plot cubic splines
 plt.clf()
 ax = plt.axes([.1, .1, .9, .9])
 
-from scipy import interpolate
-f = interpolate.interp1d(x, y,
-                         kind="quadratic",
-                         bounds_error=False, fill_value="extrapolate")
+spline = interpolate.interp1d(x, y,
+                              kind="quadratic",
+                              bounds_error=False, fill_value="extrapolate")
 plt.scatter(x, y,  color='k', s=9, zorder=20)
 x_spline = np.linspace(-1, 1, 600)
-y_spline = f(x_spline)
+y_spline = spline(x_spline)
 plt.plot(x_spline, y_spline, linewidth=3)
 
 plt.axis('tight')
@@ -406,10 +399,8 @@ plt.ylim(ymin, ymax)
 
 plt.savefig('splines_cubic_test.svg', facecolor='none', edgecolor='none')
 
-# %%
-# Simple figure to demo overfit: with linearly-generated data
 
-N_SAMPLES = 50
+# Simple figure to demo overfit: with linearly-generated data
 
 rng = np.random.RandomState(0)
 x = 2 * rng.rand(N_SAMPLES) - 1
@@ -420,11 +411,9 @@ x_test = 2 * rng.rand(10*N_SAMPLES) - 1
 
 y_test = regr.coef_ * x_test + regr.intercept_ + .4 * rng.normal(size=10*N_SAMPLES)
 
-plt.figure(figsize=(.8*4, .8*3), facecolor='none')
-plt.clf()
+style_figs.figure(figsize=(.8*4, .8*3), facecolor='none')
 ax = plt.axes([.1, .1, .9, .9])
 
-from sklearn import linear_model
 # Create linear regression object
 regr = linear_model.LinearRegression()
 regr.fit(x.reshape((-1, 1)), y)
@@ -450,18 +439,16 @@ plt.ylim(ymin, ymax)
 plt.savefig('linear_ols_test.svg', facecolor='none', edgecolor='none')
 
 
-# %%
 # Plot cubic splines
 plt.clf()
 ax = plt.axes([.1, .1, .9, .9])
 
-from scipy import interpolate
-f = interpolate.interp1d(x, y,
-                         kind="quadratic",
-                         bounds_error=False, fill_value="extrapolate")
+spline = interpolate.interp1d(x, y,
+                              kind="quadratic",
+                              bounds_error=False, fill_value="extrapolate")
 plt.scatter(x, y,  color='k', s=9, zorder=20)
 x_spline = np.linspace(-1, 1, 600)
-y_spline = f(x_spline)
+y_spline = spline(x_spline)
 plt.plot(x_spline, y_spline, linewidth=3)
 
 plt.axis('tight')
@@ -481,6 +468,3 @@ plt.xlim(-1, 1)
 plt.ylim(ymin, ymax)
 
 plt.savefig('linear_splines_test.svg', facecolor='none', edgecolor='none')
-
-
-
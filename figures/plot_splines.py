@@ -4,6 +4,8 @@ Simple example of overfit with splines
 import numpy as np
 from matplotlib import pyplot as plt
 import style_figs
+# Averages duplicates and fits splines without Python loops
+import interpolation
 
 from sklearn import datasets, linear_model
 
@@ -23,17 +25,9 @@ diabetes_X_test = diabetes_X_temp[-200:].T
 diabetes_y_train = diabetes.target[:-200:3]
 diabetes_y_test = diabetes.target[-200:]
 
-# Sort the data and remove duplicates (for interpolation)
-order = np.argsort(diabetes_X_train.ravel())
-X_train = diabetes_X_train.ravel()[order]
-y_train = diabetes_y_train[order]
-# Avoid duplicates
-y_train_ = list()
-for this_x in np.unique(X_train):
-    y_train_.append(np.mean(y_train[X_train == this_x]))
-X_train = np.unique(X_train)
-
-y_train = np.array(y_train_)
+# Sort the data and average duplicates (for interpolation)
+X_train, y_train, _ = interpolation.group_mean(diabetes_X_train,
+                                               diabetes_y_train)
 
 # Create linear regression object
 regr = linear_model.LinearRegression()
@@ -42,9 +36,8 @@ regr = linear_model.LinearRegression()
 regr.fit(X_train.reshape((-1, 1)), y_train)
 
 
-plt.figure(1, figsize=(.8*4, .8*3), facecolor='none')
 # Plot with test data
-plt.clf()
+style_figs.figure(figsize=(.8*4, .8*3), facecolor='none')
 ax = plt.axes([.1, .1, .9, .9])
 
 plt.scatter(X_train, y_train,  color='k', s=9)
@@ -71,13 +64,10 @@ plt.savefig('ols_test.svg', facecolor='none', edgecolor='none')
 plt.clf()
 ax = plt.axes([.1, .1, .9, .9])
 
-from scipy import interpolate
-f = interpolate.interp1d(X_train, y_train,
-                         kind="quadratic",
-                         bounds_error=False, fill_value="extrapolate")
+f = interpolation.fit_spline(X_train, y_train, kind="quadratic")
 plt.scatter(X_train, y_train,  color='k', s=9, zorder=20)
 x_spline = np.linspace(-.08, .12, 600)
-y_spline = f(x_spline)
+y_spline = interpolation.evaluate(f, x_spline)
 plt.plot(x_spline, y_spline, linewidth=3)
 
 plt.axis('tight')
@@ -0,0 +1,147 @@
+"""
+Validation and learning curves of 1D polynomial regression, fast.
+
+These are drop-in replacements of sklearn.model_selection.validation_curve
+and learning_curve for ``make_pipeline(PolynomialFeatures(degree),
+LinearRegression())`` scored with R2. Rather than refitting the pipeline for
+every point of the curves, they build the design matrix of the highest
+degree once per split, and share it:
+
+* across degrees, the least-squares fits are nested: the QR decomposition
+  of the first columns of the design matrix is the first block of the QR
+  decomposition of the full matrix;
+* across train sizes, the train sets are nested as well: the normal
+  equations of a train set are those of the previous one, plus the
+  contribution of the additional samples.
+
+The design matrices use a Legendre basis on the range of the data, which
+spans the same polynomials as the monomials of PolynomialFeatures but is
+much better conditioned.
+"""
+import numpy as np
+from scipy import linalg
+
+
+def _design_matrix(x, x_range, degree):
+    "Legendre design matrix of x, mapped from x_range onto [-1, 1]"
+    x_min, x_max = x_range
+    scale = (x_max - x_min) / 2 or 1.
+    return np.polynomial.legendre.legvander(
+        (x - (x_max + x_min) / 2) / scale, degree)
+
+
+def _r2(y_true, y_pred):
+    "R2 score of each column of y_pred"
+    y_true = y_true.reshape(-1, 1)
+    residuals = ((y_true - y_pred) ** 2).sum(axis=0)
+    total = ((y_true - y_true.mean()) ** 2).sum()
+    return 1 - residuals / total
+
+
+def validation_curve(x, y, degrees, cv):
+    """Train and test scores of polynomial regressions of various degrees.
+
+    Parameters
+    ----------
+    x : ndarray of shape (n_samples,)
+        The input samples.
+    y : ndarray of shape (n_samples,)
+        The target.
+    degrees : array-like of int
+        The degrees of the polynomials. They must be smaller than the number
+        of samples of the train sets.
+    cv : cross-validation generator
+        Splitter giving the train and test sets.
+
+    Returns
+    -------
+    train_scores : ndarray of shape (n_degrees, n_splits)
+        The R2 scores on the train sets.
+    test_scores : ndarray of shape (n_degrees, n_splits)
+        The R2 scores on the test sets.
+    """
+    x = np.asarray(x, dtype=float).ravel()
+    y = np.asarray(y, dtype=float)
+    degrees = np.asarray(degrees)
+    x_range = (x.min(), x.max())
+    design = _design_matrix(x, x_range, degrees.max())
+
+    train_scores, test_scores = list(), list()
+    for train, test in cv.split(x.reshape(-1, 1)):
+        if len(train) <= degrees.max():
+            raise ValueError('degree %d is too high for %d train samples'
+                             % (degrees.max(), len(train)))
+        q, r = linalg.qr(design[train], mode='economic')
+        qty = q.T @ y[train]
+        # Coefficients of each degree, as the columns of an upper
+        # triangular matrix
+        coefs = np.zeros((design.shape[1], len(degrees)))
+        for i, degree in enumerate(degrees):
+            coefs[:degree + 1, i] = linalg.solve_triangular(
+                r[:degree + 1, :degree + 1], qty[:degree + 1])
+        train_scores.append(_r2(y[train], design[train] @ coefs))
+        test_scores.append(_r2(y[test], design[test] @ coefs))
+    return np.array(train_scores).T, np.array(test_scores).T
+
+
+def learning_curve(x, y, degree, cv, train_sizes=np.linspace(.1, 1, 5)):
+    """Train and test scores of a polynomial regression for various train sizes.
+
+    Parameters
+    ----------
+    x : ndarray of shape (n_samples,)
+        The input samples.
+    y : ndarray of shape (n_samples,)
+        The target.
+    degree : int
+        The degree of the polynomial.
+    cv : cross-validation generator
+        Splitter giving the train and test sets.
+    train_sizes : array-like
+        The sizes of the train sets, either as fractions of the largest
+        train set (floats) or as numbers of samples (ints). They must be
+        larger than the degree. Like for scikit-learn, the first samples of
+        each train set are used.
+
+    Returns
+    -------
+    train_sizes : ndarray of shape (n_sizes,)
+        The numbers of train samples used.
+    train_scores : ndarray of shape (n_sizes, n_splits)
+        The R2 scores on the train sets.
+    test_scores : ndarray of shape (n_sizes, n_splits)
+        The R2 scores on the test sets.
+    """
+    x = np.asarray(x, dtype=float).ravel()
+    y = np.asarray(y, dtype=float)
+    design = _design_matrix(x, (x.min(), x.max()), degree)
+    splits = list(cv.split(x.reshape(-1, 1)))
+
+    n_max_train = len(splits[0][0])
+    train_sizes = np.asarray(train_sizes)
+    if np.issubdtype(train_sizes.dtype, np.floating):
+        train_sizes = (train_sizes * n_max_train).astype(int)
+    train_sizes = np.unique(np.clip(train_sizes, 1, n_max_train))
+    if train_sizes[0] <= degree:
+        raise ValueError('degree %d is too high for %d train samples'
+                         % (degree, train_sizes[0]))
+
+    train_scores, test_scores = list(), list()
+    for train, test in splits:
+        # Accumulate the normal equations over the nested train sets
+        gram = np.zeros((len(train_sizes), degree + 1, degree + 1))
+        moment = np.zeros((len(train_sizes), degree + 1))
+        start = 0
+        for i, stop in enumerate(train_sizes):
+            block = design[train[start:stop]]
+            gram[i] = block.T @ block + (gram[i - 1] if i else 0)
+            moment[i] = block.T @ y[train[start:stop]] + (
+                moment[i - 1] if i else 0)
+            start = stop
+        coefs = np.linalg.solve(gram, moment[..., np.newaxis])[..., 0]
+
+        train_scores.append([
+            _r2(y[train[:size]], design[train[:size]] @ coef[:, np.newaxis])[0]
+            for size, coef in zip(train_sizes, coefs)])
+        test_scores.append(_r2(y[test], design[test] @ coefs.T))
+    return train_sizes, np.array(train_scores).T, np.array(test_scores).T
@@ -1,6 +1,7 @@
 """
 Simple styling used for matplotlib figures
 """
+import weakref
 
 from matplotlib import pyplot as plt
 
@@ -32,3 +33,67 @@ def light_axis():
 def no_axis():
     plt.axis('off')
     plt.subplots_adjust(left=.0, bottom=.0, top=1, right=1)
+
+
+class FigurePool:
+    """Figures reused across the plots of a script, one per size.
+
+    Creating a figure per plot, and never closing them, makes the memory
+    grow with the number of plots. The figure of a pool for a given size
+    is rather cleared, and made the current figure of pyplot, for each new
+    plot of this size. The pool only holds its figures weakly: they are
+    freed as soon as pyplot closes them, e.g. with plt.close('all'), and
+    are closed with the pool. As a context manager::
+
+        with style_figs.FigurePool() as pool:
+            for name in names:
+                pool.figure(figsize=(2.5, 2))
+                plt.hist(...)
+                plt.savefig(name + '.svg')
+    """
+
+    def __init__(self):
+        self._figures = weakref.WeakValueDictionary()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def figure(self, figsize=None, facecolor=None):
+        "A cleared figure of the given size, made the current figure"
+        if figsize is None:
+            figsize = plt.rcParams['figure.figsize']
+        key = tuple(figsize)
+        fig = self._figures.get(key)
+        # Unless it was closed, e.g. by plt.close('all')
+        if (fig is None or not plt.fignum_exists(fig.number)
+                or plt.figure(fig.number) is not fig):
+            fig = self._figures[key] = plt.figure(figsize=figsize)
+        else:
+            fig.clear()
+            # Figure.clear does not reset them in older matplotlib
+            fig.subplots_adjust(**{
+                name: plt.rcParams['figure.subplot.' + name]
+                for name in ('left', 'bottom', 'right', 'top', 'wspace',
+                             'hspace')})
+        fig.set_facecolor(plt.rcParams['figure.facecolor']
+                          if facecolor is None else facecolor)
+        return fig
+
+    def close(self):
+        "Close the figures"
+        for fig in list(self._figures.values()):
+            plt.close(fig)
+        self._figures.clear()
+
+
+# The pool of the plots of the figure scripts, closed by plt.close('all')
+_pool = FigurePool()
+
+
+def figure(figsize=None, facecolor=None):
+    """A cleared figure of the given size, reused across the plots of the
+    script, as plt.figure(figsize=figsize, facecolor=facecolor)."""
+    return _pool.figure(figsize, facecolor)
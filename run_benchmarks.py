@@ -0,0 +1,396 @@
+"""
+Run the benchmarks of benchmarks/, and flag the regressions between commits.
+
+Each ``time_*`` method of the benchmark classes is run for every combination
+of their parameters (the sizes of the data), after their setup. Its time is
+measured as in timeit: the method is called enough times for a sample to
+last at least SAMPLE_TIME, and the best of several samples is kept. The
+peak memory allocated during a call is then measured on its own, with
+tracemalloc, which NumPy reports its arrays to.
+
+The results are appended to a history file (.benchmarks/history.jsonl),
+with the commit, the machine and the versions of the libraries, and
+compared to the last results of another commit on the same machine: a
+benchmark slower, or allocating more memory, by more than a factor is
+flagged, and the run fails, which catches the slowdowns brought by an
+upgrade of pandas or scikit-learn as well as by a change of the code::
+
+    python run_benchmarks.py                      # all the benchmarks
+    python run_benchmarks.py --bench 'GroupBy'    # the matching ones
+    python run_benchmarks.py --baseline HEAD~3    # compare to a commit
+    python run_benchmarks.py --compare abc123 def456  # no run, compare
+    python run_benchmarks.py --profile --bench 'Census.*fit\\(10000'
+
+``--profile`` rather runs the benchmarks once under cProfile, and prints
+their hot paths.
+"""
+import argparse
+import cProfile
+import datetime
+import gc
+import importlib
+import inspect
+import itertools
+import json
+import os
+import pkgutil
+import platform
+import pstats
+import re
+import statistics
+import subprocess
+import sys
+import time
+import traceback
+import tracemalloc
+from importlib import metadata
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BENCHMARKS_DIR = os.path.join(HERE, 'benchmarks')
+HISTORY = os.path.join(HERE, '.benchmarks', 'history.jsonl')
+LIBRARIES = ['numpy', 'scipy', 'pandas', 'scikit-learn', 'matplotlib']
+# A sample lasts at least this long, in seconds
+SAMPLE_TIME = .1
+REPEAT = 5
+# No more samples once a benchmark ran this long, in seconds
+MAX_TIME = 10.
+FACTOR = 1.2
+# Smaller differences of peak memory are not regressions, in bytes
+MIN_MEMORY_DIFFERENCE = 2 ** 20
+
+
+class Benchmark:
+    "A time_* method of a benchmark class, for a combination of parameters"
+
+    def __init__(self, cls, method, params):
+        self.cls = cls
+        self.method = method
+        self.params = params
+        self.name = '%s.%s.%s(%s)' % (
+            cls.__module__.split('.')[-1], cls.__name__, method,
+            ', '.join(repr(param) for param in params))
+
+
+def discover(pattern=None):
+    "The benchmarks of benchmarks/ whose name matches the regex pattern"
+    sys.path.insert(0, HERE)
+    benchmarks = []
+    for module_info in sorted(pkgutil.iter_modules([BENCHMARKS_DIR]),
+                              key=lambda module_info: module_info.name):
+        module = importlib.import_module('benchmarks.' + module_info.name)
+        for _, cls in inspect.getmembers(module, inspect.isclass):
+            if cls.__module__ != module.__name__:
+                continue
+            methods = [name for name in sorted(vars(cls))
+                       if name.startswith('time_')]
+            for params in itertools.product(*getattr(cls, 'params', [])):
+                for method in methods:
+                    benchmark = Benchmark(cls, method, params)
+                    if pattern is None or re.search(pattern, benchmark.name):
+                        benchmarks.append(benchmark)
+    return benchmarks
+
+
+def _groups(benchmarks):
+    "The benchmarks grouped by class and parameters, sharing their setup"
+    return itertools.groupby(benchmarks, key=lambda benchmark:
+                             (benchmark.cls, benchmark.params))
+
+
+def _time(func, quick=False):
+    "Best and median time of a call, and the number of calls per sample"
+    start = time.perf_counter()
+    func()
+    first = time.perf_counter() - start
+    if quick:
+        return first, first, 1, 1
+    number = 1
+    if first < SAMPLE_TIME:
+        number = int(SAMPLE_TIME / max(first, 1e-9)) + 1
+    samples = []
+    total = first
+    while len(samples) < REPEAT and (total < MAX_TIME or not samples):
+        gc.collect()
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        samples.append(elapsed / number)
+        total += elapsed
+    return min(samples), statistics.median(samples), number, len(samples)
+
+
+def _peak_memory(func):
+    "The peak of the memory allocated during a call, in bytes"
+    gc.collect()
+    # Started for each call, so that the peak is the one of the call
+    # (tracemalloc.reset_peak requires Python 3.9)
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        func()
+        return tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmarks(benchmarks, quick=False):
+    """Run the benchmarks, one setup per class and combination of parameters.
+
+    Returns
+    -------
+    results : dict
+        For the name of each benchmark, its 'time' (the best time of a
+        call, in seconds), 'median', 'number' of calls per sample,
+        'repeat' (the number of samples) and 'peakmem' (in bytes), or its
+        'error'.
+    """
+    results = dict()
+    for (cls, params), group in _groups(benchmarks):
+        group = list(group)
+        instance = cls()
+        try:
+            if hasattr(instance, 'setup'):
+                instance.setup(*params)
+        except Exception:
+            error = traceback.format_exc()
+            for benchmark in group:
+                results[benchmark.name] = {'error': error}
+                print('%-68s failed in setup' % benchmark.name)
+            continue
+        try:
+            for benchmark in group:
+                method = getattr(instance, benchmark.method)
+
+                def func():
+                    method(*params)
+
+                try:
+                    best, median, number, repeat = _time(func, quick)
+                    peakmem = _peak_memory(func)
+                except Exception:
+                    results[benchmark.name] = {
+                        'error': traceback.format_exc()}
+                    print('%-68s failed' % benchmark.name)
+                    continue
+                results[benchmark.name] = {
+                    'time': best, 'median': median, 'number': number,
+                    'repeat': repeat, 'peakmem': peakmem}
+                print('%-68s %9s %9s' % (benchmark.name, format_time(best),
+                                         format_bytes(peakmem)))
+                sys.stdout.flush()
+        finally:
+            if hasattr(instance, 'teardown'):
+                instance.teardown(*params)
+    return results
+
+
+def profile(benchmarks, n_lines=25):
+    "Print the hot paths of a call of each benchmark, found with cProfile"
+    for (cls, params), group in _groups(benchmarks):
+        instance = cls()
+        if hasattr(instance, 'setup'):
+            instance.setup(*params)
+        try:
+            for benchmark in group:
+                profiler = cProfile.Profile()
+                profiler.runcall(getattr(instance, benchmark.method), *params)
+                print('\n%s' % benchmark.name)
+                stats = pstats.Stats(profiler, stream=sys.stdout)
+                stats.sort_stats('cumulative').print_stats(n_lines)
+        finally:
+            if hasattr(instance, 'teardown'):
+                instance.teardown(*params)
+
+
+def format_time(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return '%.3g%s' % (seconds / scale, unit)
+    return '%.3gns' % (seconds * 1e9)
+
+
+def format_bytes(n_bytes):
+    for unit, scale in (('G', 2 ** 30), ('M', 2 ** 20), ('k', 2 ** 10)):
+        if n_bytes >= scale:
+            return '%.1f%s' % (n_bytes / scale, unit)
+    return '%d' % n_bytes
+
+
+def _git(*args):
+    try:
+        return subprocess.run(['git'] + list(args), cwd=HERE, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    "The commit, the machine and the versions of the libraries of a run"
+    versions = dict()
+    for name in LIBRARIES:
+        try:
+            versions[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            pass
+    return {'commit': _git('rev-parse', 'HEAD'),
+            'dirty': bool(_git('status', '--porcelain',
+                               '--untracked-files=no')),
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'machine': platform.node(),
+            'python': platform.python_version(),
+            'versions': versions}
+
+
+def load_history(path=HISTORY):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def record(entry, path=HISTORY):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'a') as f:
+        f.write(json.dumps(entry) + '\n')
+
+
+def find_entry(history, revision, machine=None):
+    "The last entry of the history at a revision (a commit or a git name)"
+    commit = _git('rev-parse', '--verify', '--quiet', revision) or revision
+    for entry in reversed(history):
+        if ((entry['commit'] or '').startswith(commit)
+                and machine in (None, entry['machine'])):
+            return entry
+    return None
+
+
+def find_baseline(history, current):
+    """The last entry of another commit on the same machine, or of the same
+    commit without the uncommitted changes of the current run."""
+    for entry in reversed(history):
+        if entry['machine'] != current['machine']:
+            continue
+        if entry['commit'] != current['commit'] or (current['dirty']
+                                                    and not entry['dirty']):
+            return entry
+    return None
+
+
+def _describe(entry):
+    return '%s%s (%s)' % ((entry['commit'] or 'unknown')[:10],
+                          '+' if entry['dirty'] else '', entry['date'])
+
+
+def compare(baseline, current, factor=FACTOR):
+    """Print the changes of the benchmarks run in both entries.
+
+    Returns
+    -------
+    regressions : list of str
+        The names of the benchmarks slower, or allocating more memory, by
+        more than factor.
+    """
+    print('\nCompared to %s:' % _describe(baseline))
+    for name, library in sorted(current['versions'].items()):
+        if baseline['versions'].get(name) != library:
+            print('    %s %s -> %s' % (name, baseline['versions'].get(name),
+                                       library))
+    regressions = []
+    for name, result in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None or 'error' in before or 'error' in result:
+            continue
+        time_ratio = result['time'] / before['time']
+        memory_ratio = (result['peakmem'] + 1) / (before['peakmem'] + 1)
+        changes = []
+        if time_ratio > factor:
+            changes.append('time x%.2f' % time_ratio)
+        elif time_ratio < 1 / factor:
+            changes.append('time x%.2f (faster)' % time_ratio)
+        memory_difference = abs(result['peakmem'] - before['peakmem'])
+        if memory_difference > MIN_MEMORY_DIFFERENCE:
+            if memory_ratio > factor:
+                changes.append('memory x%.2f' % memory_ratio)
+            elif memory_ratio < 1 / factor:
+                changes.append('memory x%.2f (less)' % memory_ratio)
+        if not changes:
+            continue
+        regression = (time_ratio > factor
+                      or (memory_ratio > factor
+                          and memory_difference > MIN_MEMORY_DIFFERENCE))
+        if regression:
+            regressions.append(name)
+        print('%s %-66s %s' % ('!' if regression else ' ', name,
+                               ', '.join(changes)))
+    if regressions:
+        print('%d regression(s), by more than a factor %g'
+              % (len(regressions), factor))
+    else:
+        print('No regression, by more than a factor %g' % factor)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--bench', '-b', default=None,
+                        help='run the benchmarks matching this regex')
+    parser.add_argument('--quick', action='store_true',
+                        help='a single call per benchmark, neither '
+                             'recorded nor compared')
+    parser.add_argument('--baseline', default=None,
+                        help='compare to the results of this commit '
+                             '(default: the last other commit run)')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'NEW'),
+                        help='compare the results of two commits, without '
+                             'running the benchmarks')
+    parser.add_argument('--factor', type=float, default=FACTOR,
+                        help='the ratio flagged as a regression (default: '
+                             '%(default)s)')
+    parser.add_argument('--profile', action='store_true',
+                        help='print the hot paths of the benchmarks')
+    parser.add_argument('--history', default=HISTORY,
+                        help='the history file (default: %(default)s)')
+    args = parser.parse_args(argv)
+    history = load_history(args.history)
+
+    if args.compare:
+        entries = [find_entry(history, revision)
+                   for revision in args.compare]
+        for revision, entry in zip(args.compare, entries):
+            if entry is None:
+                parser.error('No results of %s in %s'
+                             % (revision, args.history))
+        return 1 if compare(*entries, factor=args.factor) else 0
+
+    benchmarks = discover(args.bench)
+    if not benchmarks:
+        parser.error('No benchmark matches %r' % args.bench)
+    if args.profile:
+        profile(benchmarks)
+        return 0
+    current = environment()
+    current['results'] = run_benchmarks(benchmarks, args.quick)
+    failed = [name for name, result in current['results'].items()
+              if 'error' in result]
+    for name in failed:
+        print('\n%s failed:\n%s' % (name, current['results'][name]['error']))
+    if args.quick:
+        # A single call is too noisy to be compared
+        return 1 if failed else 0
+    record(current, args.history)
+    if args.baseline is not None:
+        baseline = find_entry(history, args.baseline, current['machine'])
+        if baseline is None:
+            parser.error('No results of %s on this machine in %s'
+                         % (args.baseline, args.history))
+    else:
+        baseline = find_baseline(history, current)
+    regressions = []
+    if baseline is not None:
+        regressions = compare(baseline, current, args.factor)
+    return 1 if regressions or failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
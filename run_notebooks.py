@@ -0,0 +1,534 @@
+"""
+Run the notebooks of the workshop, skipping the cells that did not change.
+
+The notebooks are run in parallel on a pool of processes, each of them
+hosting an IPython shell, reset between notebooks. Each code cell is keyed
+on a hash of its source and of the key of the previous cell, the first one
+on the local modules imported by the notebook and the versions of the
+libraries: when a cell is edited, the key of this cell and of the ones
+after it change.
+
+The outputs of the cells are cached in .notebook_cache/, with the state of
+the shell (the picklable variables of its namespace, the modules imported,
+sys.path and the random states) after the cells that took some time. A run
+restores the last state before the first changed cell, replays the few
+cells after it, and runs the changed cells and the following ones: after a
+one-line edit, only the end of a notebook is run.
+
+The exercises load their solutions in cells such as
+``# %load _solutions/pandas_01_data_structures1.py``: these cells are run
+with the source of the solution, so that the next cells can use its
+variables.
+
+The wall time and the peak resident memory of each cell are written in a
+JSON report.
+
+Usage::
+
+    python run_notebooks.py [--force] [--jobs N] [--allow-errors]
+                            [--report report.json] [--output-dir DIR]
+                            [notebook.ipynb or directory ...]
+"""
+import argparse
+import base64
+import hashlib
+import importlib
+import io
+import json
+import os
+import pickle
+import random
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from importlib import metadata
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(HERE, '.notebook_cache')
+MANIFEST = os.path.join(CACHE_DIR, 'manifest.json')
+REPORT = os.path.join(CACHE_DIR, 'report.json')
+# The versions of these distributions are part of the key of the cells
+LIBRARIES = ['numpy', 'scipy', 'pandas', 'scikit-learn', 'matplotlib',
+             'seaborn', 'ipython']
+# The state is saved after cells taking this long to replay, in seconds
+SNAPSHOT_MIN_TIME = .5
+SNAPSHOT_BYTES_LIMIT = 200 * 2 ** 20
+LOAD_SOLUTION = re.compile(r'^#\s*%load\s+(\S+)\s*$')
+# The variables of the shell itself
+HIDDEN_NAMES = {'In', 'Out', 'get_ipython', 'exit', 'quit', 'open'}
+
+# The shell of a worker process, created once by _init_worker
+_worker = {}
+
+
+def find_notebooks(paths):
+    "The notebooks given, or found in the given directories"
+    notebooks = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+                notebooks.extend(os.path.join(root, name)
+                                 for name in sorted(files)
+                                 if name.endswith('.ipynb'))
+        else:
+            notebooks.append(path)
+    return [os.path.abspath(notebook) for notebook in notebooks]
+
+
+def code_cells(notebook_path, solutions=True):
+    "The sources of the code cells, with the solutions they load"
+    with open(notebook_path, encoding='utf-8') as f:
+        notebook = json.load(f)
+    sources = []
+    for cell in notebook['cells']:
+        if cell['cell_type'] != 'code':
+            continue
+        source = ''.join(cell['source'])
+        match = LOAD_SOLUTION.match(source.strip())
+        if solutions and match:
+            path = os.path.join(os.path.dirname(notebook_path),
+                                match.group(1))
+            if os.path.exists(path):
+                with open(path, encoding='utf-8') as f:
+                    source = f.read()
+        sources.append(source)
+    return notebook, sources
+
+
+def _local_module_sources(notebook_path, sources):
+    "Sources of the local modules and packages imported by a notebook"
+    names = set()
+    for source in sources:
+        names.update(re.findall(r'^\s*(?:from|import)\s+(\w+)', source,
+                                flags=re.M))
+    directory = os.path.dirname(notebook_path)
+    search_path = [directory, os.path.dirname(directory), HERE]
+    found = []
+    for name in sorted(names):
+        for base in search_path:
+            module = os.path.join(base, name + '.py')
+            package = os.path.join(base, name)
+            if os.path.exists(module):
+                found.append(module)
+                break
+            if os.path.exists(os.path.join(package, '__init__.py')):
+                found.extend(os.path.join(package, filename)
+                             for filename in sorted(os.listdir(package))
+                             if filename.endswith('.py'))
+                break
+    contents = []
+    for path in found:
+        with open(path, 'rb') as f:
+            contents.append(f.read())
+    return contents
+
+
+def _versions():
+    versions = [sys.version]
+    for name in LIBRARIES:
+        try:
+            versions.append('%s %s' % (name, metadata.version(name)))
+        except metadata.PackageNotFoundError:
+            pass
+    return versions
+
+
+def cell_keys(notebook_path, sources):
+    "The key of each code cell, chaining the keys of the cells above it"
+    digest = hashlib.sha256()
+    for part in ([os.path.relpath(notebook_path, HERE).encode()]
+                 + [version.encode() for version in _versions()]
+                 + _local_module_sources(notebook_path, sources)):
+        digest.update(hashlib.sha256(part).digest())
+    keys = []
+    key = digest.hexdigest()
+    for source in sources:
+        key = hashlib.sha256((key + source).encode()).hexdigest()
+        keys.append(key)
+    return keys
+
+
+def _cache_path(key, extension):
+    return os.path.join(CACHE_DIR, key[:2], key + extension)
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _load_entry(key):
+    path = _cache_path(key, '.json')
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+class _PeakMemory:
+    "Peak resident memory of the process while in the context, in bytes"
+
+    def __init__(self, interval=.01):
+        self.interval = interval
+
+    @staticmethod
+    def rss():
+        try:
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError):
+            # Not Linux: the peak of the process so far
+            import resource
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return peak if sys.platform == 'darwin' else peak * 1024
+
+    def _sample(self):
+        while not self._done.wait(self.interval):
+            self.peak = max(self.peak, self.rss())
+
+    def __enter__(self):
+        self.peak = self.rss()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._done.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.rss())
+
+
+def _make_shell():
+    "An IPython shell recording the results and figures of the cells"
+    from IPython.core.displayhook import DisplayHook
+    from IPython.core.interactiveshell import InteractiveShell
+
+    class ResultHook(DisplayHook):
+        def write_output_prompt(self):
+            pass
+
+        def write_format_data(self, format_dict, md_dict=None):
+            self.shell.results.append(
+                {'output_type': 'execute_result',
+                 'execution_count': self.prompt_count,
+                 'data': format_dict, 'metadata': md_dict or {}})
+
+    class WorkshopShell(InteractiveShell):
+        displayhook_class = ResultHook
+
+        def enable_gui(self, gui=None):
+            # Headless: figures are shown inline
+            pass
+
+    shell = WorkshopShell.instance()
+    shell.results = []
+    try:
+        shell.enable_matplotlib('inline')
+    except ImportError:
+        pass
+    return shell
+
+
+def _init_worker():
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+    # The shell makes its namespace the __main__ module, but the tasks
+    # refer to the functions of this script as __main__ ones
+    _worker['main'] = sys.modules['__main__']
+    _worker['shell'] = _make_shell()
+    sys.modules['__main__'] = _worker['main']
+    _worker['sys_path'] = list(sys.path)
+    _worker['modules'] = set(sys.modules)
+
+
+def _reset_worker(directory):
+    "A clean shell for the next notebook, run from its directory"
+    shell = _worker['shell']
+    shell.reset(new_session=True)
+    shell.results = []
+    sys.path[:] = [directory] + _worker['sys_path']
+    # The local modules may differ from one notebook to the other
+    for name in list(sys.modules):
+        module = sys.modules[name]
+        path = getattr(module, '__file__', None) or ''
+        if (name not in _worker['modules']
+                and os.path.abspath(path).startswith(HERE + os.sep)):
+            del sys.modules[name]
+    os.chdir(directory)
+    sys.modules['__main__'] = shell.user_module
+    return shell
+
+
+def _snapshot(shell):
+    """The state of the shell, as bytes, or None if it cannot be restored in
+    another process (e.g. functions defined by the notebook)."""
+    hidden = set(shell.user_ns_hidden) | HIDDEN_NAMES
+    modules, variables = {}, {}
+    for name, value in shell.user_ns.items():
+        if name in hidden or name.startswith('_'):
+            continue
+        if type(value) is type(sys):
+            modules[name] = value.__name__
+        else:
+            variables[name] = value
+    state = {'modules': modules, 'variables': variables,
+             'sys_path': list(sys.path), 'random': random.getstate()}
+    if 'numpy' in sys.modules:
+        state['numpy_random'] = sys.modules['numpy'].random.get_state()
+    try:
+        data = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        return None
+    # Pickled by reference to the namespace of the notebook
+    if b'__main__' in data or len(data) > SNAPSHOT_BYTES_LIMIT:
+        return None
+    return data
+
+
+def _restore(shell, data):
+    state = pickle.loads(data)
+    sys.path[:] = state['sys_path']
+    for name, module in state['modules'].items():
+        shell.user_ns[name] = importlib.import_module(module)
+    shell.user_ns.update(state['variables'])
+    random.setstate(state['random'])
+    if 'numpy_random' in state:
+        importlib.import_module('numpy').random.set_state(
+            state['numpy_random'])
+
+
+def _run_cell(shell, source):
+    "Run a cell, returning its outputs, duration, peak memory and error"
+    from IPython.utils.capture import capture_output
+
+    shell.results = []
+    start = time.perf_counter()
+    with _PeakMemory() as memory, capture_output() as captured:
+        result = shell.run_cell(source, store_history=True)
+    duration = time.perf_counter() - start
+    outputs = []
+    for name, text in [('stdout', captured.stdout),
+                       ('stderr', captured.stderr)]:
+        if text:
+            outputs.append({'output_type': 'stream', 'name': name,
+                            'text': text})
+    outputs.extend({'output_type': 'display_data', 'data': output.data,
+                    'metadata': output.metadata or {}}
+                   for output in captured.outputs)
+    outputs.extend(shell.results)
+    if 'matplotlib.pyplot' in sys.modules:
+        # Figures left open, e.g. without the inline backend
+        plt = sys.modules['matplotlib.pyplot']
+        for number in plt.get_fignums():
+            image = io.BytesIO()
+            plt.figure(number).savefig(image, format='png')
+            outputs.append({'output_type': 'display_data', 'metadata': {},
+                            'data': {'image/png': base64.b64encode(
+                                image.getvalue()).decode()}})
+        plt.close('all')
+    error = result.error_before_exec or result.error_in_exec
+    if error is not None:
+        outputs.append({'output_type': 'error',
+                        'ename': type(error).__name__,
+                        'evalue': str(error), 'traceback': []})
+    return outputs, duration, memory.peak, error
+
+
+def _run_cells(notebook_path, sources, keys, restart, n_cached, cells,
+               outputs, allow_errors):
+    """Run the cells from restart on, after restoring the state saved by
+    the cell before it, updating cells and outputs."""
+    shell = _reset_worker(os.path.dirname(notebook_path))
+    status = 'ok'
+    if restart > 0:
+        with open(_cache_path(keys[restart - 1], '.pickle'), 'rb') as f:
+            _restore(shell, f.read())
+    failed = False
+    since_snapshot = 0.
+    for i in range(restart, len(keys)):
+        if failed and not allow_errors:
+            cells[i].update(status='not run', time=None, peak_rss=None)
+            continue
+        cell_outputs, duration, peak, error = _run_cell(shell,
+                                                        sources[i])
+        cells[i].update(time=duration, peak_rss=peak)
+        if error is not None:
+            cells[i]['status'] = 'error'
+            cells[i]['error'] = '%s: %s' % (type(error).__name__, error)
+            outputs[i] = cell_outputs
+            failed = True
+            status = 'error'
+            continue
+        cells[i]['status'] = 'replayed' if i < n_cached else 'run'
+        if i >= n_cached:
+            outputs[i] = cell_outputs
+        if failed:
+            # The state after a failed cell is not reproducible
+            continue
+        _write_atomic(_cache_path(keys[i], '.json'), json.dumps(
+            {'outputs': outputs[i], 'time': duration,
+             'peak_rss': peak}).encode())
+        since_snapshot += duration
+        if since_snapshot >= SNAPSHOT_MIN_TIME and i < len(keys) - 1:
+            data = _snapshot(shell)
+            if data is not None:
+                _write_atomic(_cache_path(keys[i], '.pickle'), data)
+                since_snapshot = 0.
+    return status
+
+
+def run_notebook(notebook_path, force=False, allow_errors=False,
+                 solutions=True, output_dir=None):
+    """Run a notebook in the shell of a worker process, through the cache.
+
+    Returns the report of the notebook, with the key and status of each of
+    its code cells: 'cached' (not run), 'replayed' (run again to rebuild
+    the state, its outputs being cached), 'run', 'error' or 'not run'.
+    """
+    notebook, sources = code_cells(notebook_path, solutions)
+    keys = cell_keys(notebook_path, sources)
+    entries = [None if force else _load_entry(key) for key in keys]
+    # The cached prefix, and the last state saved in it
+    n_cached = 0
+    while n_cached < len(keys) and entries[n_cached] is not None:
+        n_cached += 1
+    restart = 0
+    if n_cached < len(keys):
+        for i in range(n_cached - 1, -1, -1):
+            if os.path.exists(_cache_path(keys[i], '.pickle')):
+                restart = i + 1
+                break
+    else:
+        restart = len(keys)
+
+    start = time.perf_counter()
+    cells = [{'index': i, 'key': key, 'status': 'cached',
+              'time': entry and entry['time'],
+              'peak_rss': entry and entry['peak_rss']}
+             for i, (key, entry) in enumerate(zip(keys, entries))]
+    outputs = [entry and entry['outputs'] for entry in entries]
+    status = 'ok'
+    try:
+        if restart < len(keys):
+            status = _run_cells(notebook_path, sources, keys, restart,
+                                n_cached, cells, outputs, allow_errors)
+    finally:
+        sys.modules['__main__'] = _worker['main']
+
+    if output_dir is not None:
+        _write_notebook(notebook, outputs, cells, notebook_path, output_dir)
+    return {'notebook': os.path.relpath(notebook_path, HERE),
+            'status': status, 'time': time.perf_counter() - start,
+            'n_cells': len(keys),
+            'n_run': sum(cell['status'] in ('run', 'replayed', 'error')
+                         for cell in cells),
+            'cells': cells}
+
+
+def _write_notebook(notebook, outputs, cells, notebook_path, output_dir):
+    "Write a copy of the notebook with the outputs of its code cells"
+    code = iter(zip(outputs, cells))
+    for cell in notebook['cells']:
+        if cell['cell_type'] != 'code':
+            continue
+        cell_outputs, report = next(code)
+        cell['outputs'] = cell_outputs or []
+        cell['execution_count'] = report['index'] + 1
+    path = os.path.join(output_dir, os.path.relpath(notebook_path, HERE))
+    _write_atomic(path, (json.dumps(notebook, indent=1, ensure_ascii=False)
+                         + '\n').encode('utf-8'))
+
+
+def _prune_cache(manifest):
+    "Remove the cached cells of no notebook of the manifest"
+    keys = {key for entry in manifest.values() for key in entry['keys']}
+    for root, _, files in os.walk(CACHE_DIR):
+        for name in files:
+            key, extension = os.path.splitext(name)
+            if extension in ('.json', '.pickle') and len(key) == 64 and (
+                    key not in keys):
+                os.remove(os.path.join(root, name))
+
+
+def run(notebooks, force=False, n_jobs=None, allow_errors=False,
+        solutions=True, report=REPORT, output_dir=None):
+    """Run notebooks in parallel, through the cache.
+
+    Returns the number of notebooks that failed.
+    """
+    start = time.perf_counter()
+    manifest = {}
+    if os.path.exists(MANIFEST):
+        with open(MANIFEST) as f:
+            manifest = json.load(f)
+    reports = []
+    with ProcessPoolExecutor(max_workers=n_jobs,
+                             initializer=_init_worker) as executor:
+        futures = {executor.submit(run_notebook, notebook, force,
+                                   allow_errors, solutions, output_dir):
+                   notebook for notebook in notebooks}
+        for future in as_completed(futures):
+            name = os.path.relpath(futures[future], HERE)
+            try:
+                result = future.result()
+            except Exception as e:
+                print('[FAIL] %s: %r' % (name, e))
+                reports.append({'notebook': name, 'status': 'crashed',
+                                'error': repr(e)})
+                continue
+            reports.append(result)
+            manifest[name] = {'keys': [cell['key']
+                                       for cell in result['cells']]}
+            errors = [cell for cell in result['cells']
+                      if cell['status'] == 'error']
+            print('[%s] %s: %d/%d cells run in %.1fs%s'
+                  % ('done' if result['status'] == 'ok' else 'FAIL', name,
+                     result['n_run'], result['n_cells'], result['time'],
+                     ''.join('\n    cell %d: %s' % (cell['index'],
+                                                    cell['error'])
+                             for cell in errors)))
+
+    _write_atomic(MANIFEST, json.dumps(manifest, indent=1,
+                                       sort_keys=True).encode())
+    _prune_cache(manifest)
+    reports.sort(key=lambda result: result['notebook'])
+    _write_atomic(report, json.dumps(
+        {'time': time.perf_counter() - start, 'notebooks': reports},
+        indent=1).encode())
+    return sum(result['status'] != 'ok' for result in reports)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('paths', nargs='*', default=[HERE],
+                        help='notebooks, or directories to search for '
+                             'notebooks (default: the whole workshop)')
+    parser.add_argument('--force', action='store_true',
+                        help='run all the cells, ignoring the cache')
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                        help='number of worker processes (default: one per '
+                             'CPU)')
+    parser.add_argument('--allow-errors', action='store_true',
+                        help='run the cells after a failed cell')
+    parser.add_argument('--no-solutions', action='store_true',
+                        help='do not run the solutions loaded by %%load '
+                             'comments')
+    parser.add_argument('--report', default=REPORT,
+                        help='the JSON report (default: %(default)s)')
+    parser.add_argument('--output-dir', default=None,
+                        help='write the executed notebooks there')
+    args = parser.parse_args(argv)
+    notebooks = find_notebooks(args.paths)
+    return 1 if run(notebooks, args.force, args.jobs, args.allow_errors,
+                    not args.no_solutions, args.report,
+                    args.output_dir) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,14 @@
+"""
+The helper modules sit next to the notebooks using them, which add their
+directory to sys.path: so do the tests.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+for directory in [ROOT,
+                  os.path.join(ROOT, 'Day_1_Scientific_Python', 'pandas'),
+                  os.path.join(ROOT, 'Day_2_Machine_Learning_Python')]:
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
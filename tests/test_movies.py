@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+
+import movies
+
+VALUES = ['b', 'c', 'a', 'c', 'a', 'b', 'd', None]
+
+
+def test_value_counts_ties_in_order_of_first_occurrence():
+    for values in [pd.Series(VALUES, name='name'),
+                   pd.Series([2, 3, 1, 3, 1, 2, 4], name='year')]:
+        tm.assert_series_equal(movies.value_counts(values),
+                               values.value_counts())
+
+
+def test_value_counts_ties_in_order_of_categories():
+    for categories in [['d', 'c', 'b', 'a', 'e'], ['a', 'b', 'c', 'd', 'e']]:
+        values = pd.Series(pd.Categorical(VALUES, categories=categories),
+                           name='name')
+        tm.assert_series_equal(movies.value_counts(values),
+                               values.value_counts())
+    values = values[np.asarray(values != 'd')]
+    tm.assert_series_equal(movies.value_counts(values), values.value_counts())
+
+
+def test_group_by_unsorted_categories():
+    frame = pd.DataFrame({
+        'name': pd.Categorical(['b', 'a', 'c', 'a'],
+                               categories=['c', 'b', 'a', 'd']),
+        'year': [1990, 2000, 2000, 1990], 'n': [1., 2., 3., 4.]})
+    for by in ['name', ['name', 'year'], ['year', 'name']]:
+        tm.assert_series_equal(movies.group_size(frame, by),
+                               frame.groupby(by).size())
+        tm.assert_series_equal(movies.group_agg(frame, by, 'n', 'max'),
+                               frame.groupby(by)['n'].max())
+    tm.assert_series_equal(movies.group_transform(frame, 'name', 'n', 'sum'),
+                           frame.groupby('name')['n'].transform('sum'))
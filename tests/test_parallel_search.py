@@ -0,0 +1,15 @@
+import numpy as np
+
+import parallel_search
+
+
+def test_cv_results_ranks_incomplete_candidates_last():
+    scores = {(0, 0): .5, (0, 1): .5, (1, 0): np.nan, (1, 1): .2,
+              (2, 0): .9, (2, 1): .9, (3, 0): .5}
+    results = [dict(candidate=i, split=k, n_splits=2, test_score=score,
+                    fit_time=0., score_time=0.)
+               for (i, k), score in scores.items()]
+    cv_results = parallel_search.cv_results(results, [{}] * 4)
+    ranks = cv_results['rank_test_score']
+    assert ranks.dtype == np.int32
+    np.testing.assert_array_equal(ranks, [2, 3, 1, 3])
@@ -0,0 +1,19 @@
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import OneHotEncoder
+
+from sparse_encoding import SparseOneHotEncoder
+
+
+def test_sparse_one_hot_encoder_as_one_hot_encoder():
+    X = pd.DataFrame({
+        'workclass': ['Private', 'State-gov', 'Private', 'Federal-gov'],
+        'sex': pd.Categorical(['Male', 'Female', 'Female', 'Male'],
+                              categories=['Male', 'Female']),
+        'education': ['HS-grad', 'Bachelors', 'Masters', 'HS-grad']})
+    encoder = SparseOneHotEncoder().fit(X)
+    expected = OneHotEncoder(sparse_output=True).fit(X)
+    np.testing.assert_array_equal(encoder.get_feature_names_out(),
+                                  expected.get_feature_names_out())
+    np.testing.assert_array_equal(encoder.transform(X).toarray(),
+                                  expected.transform(X).toarray())
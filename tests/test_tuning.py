@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+from sklearn.feature_selection import SelectKBest
+from sklearn.preprocessing import StandardScaler
+
+import tuning
+
+
+def test_cached_transformer_distinct_frames_same_index():
+    a = pd.DataFrame({'x': [1., 2., 3.]})
+    b = pd.DataFrame({'x': [10., 20., 40.]})
+    transformer = tuning.CachedTransformer(StandardScaler()).fit(a)
+    expected = StandardScaler().fit(a).transform(b)
+    np.testing.assert_allclose(transformer.transform(b), expected)
+
+
+def test_cached_transformer_refits_for_another_target():
+    rng = np.random.RandomState(0)
+    X = pd.DataFrame({'a': rng.rand(100), 'b': rng.rand(100)})
+    y_a = (X['a'] > .5).to_numpy().astype(int)
+    y_b = (X['b'] > .5).to_numpy().astype(int)
+    for y, column in [(y_a, 'a'), (y_b, 'b')]:
+        cached = tuning.CachedTransformer(SelectKBest(k=1))
+        Xt = cached.fit_transform(X, y)
+        assert SelectKBest(k=1).fit(X, y).get_feature_names_out() == [column]
+        np.testing.assert_array_equal(Xt, X[[column]].to_numpy())
+        np.testing.assert_array_equal(cached.transform(X),
+                                      X[[column]].to_numpy())
+
+
+def test_cached_transformer_evicts_fitted_transformers(monkeypatch):
+    monkeypatch.setattr(tuning, 'BYTES_LIMIT', 5000)
+    X = pd.DataFrame({'x': np.arange(100.)})
+    for shift in range(10):
+        cached = tuning.CachedTransformer(StandardScaler())
+        cached.fit(X + shift)
+        np.testing.assert_allclose(cached.transform(X + shift),
+                                   StandardScaler().fit_transform(X))
+    assert sum(size for _, size in tuning._cache.values()) <= 5000
+    fitted = [key for key in tuning._cache if key[-1] == 'transformer']
+    assert 0 < len(fitted) < 10